@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks of the slow paths of the event viewer, on synthetic data.
+Usage: python benchmark.py <benchmark> [options], see python benchmark.py -h
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+
+def Timeit(function, repeat):
+    # Median wall time (s) of repeat calls of function
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return np.median(times)
+
+
+def SyntheticTrace(samples, seed=0):
+    # Noise with a pulse in the middle, sampled every ns, and its spectrum
+    rng = np.random.default_rng(seed)
+    times = np.arange(samples, dtype=float)
+    signal = rng.normal(size=samples) * 1e-5
+    signal += 2e-4 * np.exp(-0.5 * ((times - samples / 2) / 5) ** 2)
+    freqs = np.fft.rfftfreq(samples, d=1.0) * 1e3
+    spectrum = np.abs(np.fft.rfft(signal))
+    hilbert = np.abs(signal) * 1.2
+    return times, hilbert, signal, freqs, spectrum
+
+
+def LoopBandEdges(dBmHz):
+    # Band edges with the former loop over the bins, the reference of BandEdges
+    low = 1
+    high = len(dBmHz)
+    for ibin in range(1, len(dBmHz) - 3):
+        if (
+            0.5 * (dBmHz[ibin + 1] + dBmHz[ibin + 2])
+            - 0.5 * (dBmHz[ibin] + dBmHz[ibin - 1])
+            > 30
+            and dBmHz[ibin + 1] > -300
+        ):
+            low = ibin + 1
+        if (
+            0.5 * (dBmHz[ibin + 1] + dBmHz[ibin + 2])
+            - 0.5 * (dBmHz[ibin] + dBmHz[ibin - 1])
+            < -30
+            and dBmHz[ibin] > -300
+        ):
+            high = ibin
+    return low, high
+
+
+class FormerAntennaPlots(object):
+    """
+    The waveform plots of Antenna before the in place isADC toggle (new lines on cleared
+    axes, band edges with the per-bin loop), the reference of antenna-toggle
+    """
+
+    def __init__(self, antenna):
+        self.antenna = antenna
+
+    def __getattr__(self, name):
+        # Units, labels and isADC of the antenna
+        return getattr(self.antenna, name)
+
+    def TimeFreqDbPlot(self, channels, axlist, plotFrac, plotLabel):
+        # channels holds the arrays of AntDataMapToPython for channels 0 and 1
+        times, hilbert1, signal1, freqs, f_signal1 = channels[0]
+        times, hilbert2, signal2, freqs, f_signal2 = channels[1]
+
+        ax = axlist["waveforms_time"]
+
+        self.MakeTimePlot(ax, times, signal1, plotFrac, "b", plotLabel + " Ch.1")
+        self.MakeTimePlot(ax, times, signal2, plotFrac, "r", plotLabel + " Ch.2")
+        if not self.isADC:
+            self.MakeHilbertPlot(
+                ax, times, hilbert1, plotFrac, "k", plotLabel + " Ch.1"
+            )
+            self.MakeHilbertPlot(
+                ax, times, hilbert2, plotFrac, "g", plotLabel + " Ch.2"
+            )
+        ax.legend(prop={"size": 5})
+
+        ax = axlist["waveforms_freq"]
+
+        if self.isADC:
+            self.MakeFreqPlot(ax, freqs, f_signal1, plotFrac, "b", plotLabel + "Ch.1")
+            self.MakeFreqPlot(ax, freqs, f_signal2, plotFrac, "r", plotLabel + "Ch.2")
+        else:
+            self.MakedBmHzPlot(ax, freqs, f_signal1, plotFrac, "b", plotLabel + " Ch.1")
+            self.MakedBmHzPlot(ax, freqs, f_signal2, plotFrac, "r", plotLabel + " Ch.2")
+
+        ax.legend(prop={"size": 5})
+
+    def MakeTimePlot(self, ax, times, amps, plotFrac, plotColor, plotLabel):
+        # Plots the time series from the passed in values
+
+        plotBins = int(len(times) * plotFrac) - 1
+
+        if not self.isADC:
+            amps = np.array(amps)
+            amps /= self.voltageUnit
+
+        if self.isADC:
+            mean = np.mean(amps[0:plotBins])
+            ax.plot(
+                times[0:plotBins],
+                amps[0:plotBins] - mean,
+                color=plotColor,
+                label=plotLabel,
+            )
+        else:
+            rms = np.std(amps[0:plotBins])
+            ax.plot(
+                times[0:plotBins],
+                amps[0:plotBins],
+                color=plotColor,
+                label=plotLabel + " - RMS: {0:0.3f}".format(rms),
+            )
+
+        if not self.isADC:
+            thisMax = max(amps[0:plotBins])
+            thisMin = min(amps[0:plotBins])
+            ylow, yhigh = ax.get_ylim()
+            ymax = max([ylow, yhigh, thisMax, -thisMin])
+            ax.set_ylim(-ymax * 1.02, ymax * 1.02)
+            ax.set_ylabel("Amplitude [" + self.voltageUnitName + "]")
+        else:
+            ax.set_ylabel("Amplitude [ADC]")
+
+        ax.set_xlabel("Time [" + self.timeUnitName + "]")
+        ax.set_xlim(times[0], times[plotBins])
+
+    def MakeHilbertPlot(self, ax, times, amps, plotFrac, plotColor, plotLabel):
+        # Draws the Hilbert envelope from the passed in values
+
+        plotBins = int(len(times) * plotFrac) - 1
+
+        if not self.isADC:
+            amps = np.array(amps)
+            amps /= self.voltageUnit
+
+        ax.plot(
+            times[0:plotBins],
+            amps[0:plotBins],
+            color=plotColor,
+            label=plotLabel,
+            linestyle="dashed",
+        )
+
+        if not self.isADC:
+            ax.set_ylabel("Amplitude [" + self.voltageUnitName + "]")
+        else:
+            ax.set_ylabel("Amplitude [ADC]")
+
+        ax.set_xlabel("Time [" + self.timeUnitName + "]")
+        ax.set_xlim(times[0], times[plotBins])
+
+    def MakeFreqPlot(self, ax, freqs, amps, plotFrac, plotColor, plotLabel):
+        # Plots the frequency spectrum from the passed in values
+        # Automatically converts to logscale if the values are large
+
+        plotBins = int(len(freqs) * plotFrac) - 1
+
+        if not self.isADC:
+            amps = np.array(amps)
+            amps /= self.specUnit
+
+        ax.plot(freqs[1:plotBins], amps[1:plotBins], color=plotColor, label=plotLabel)
+        ylow, yhigh = ax.get_ylim()
+        if yhigh >= 1000:
+            ax.set_yscale("log")
+        ax.set_xlabel("Frequency [" + self.freqUnitName + "]")
+        ax.set_xlim(freqs[0], freqs[plotBins])
+
+        if not self.isADC:
+            ax.set_ylabel("Amplitude [" + self.specUnitName + "]")
+        else:
+            ax.set_ylabel("Amplitude [ADC/Hz]")
+
+    def MakedBmHzPlot(self, ax, freqs, amps, plotFrac, plotColor, plotLabel):
+        # Plots the frequency spectrum in dBm/Hz for the passed in amplitudes
+        from icecube.icetray import I3Units
+
+        plotBins = int(len(freqs) * plotFrac) - 1
+
+        amps = np.array(amps)
+        df = (freqs[1] - freqs[0]) * self.freqUnit
+
+        # Convert to power
+        pz = (amps * np.sqrt(2.0) * df) ** 2
+        power = pz / (50 * I3Units.ohm)
+        # Power per 1mW
+        powerPermW = power / (1.0e-3 * I3Units.joule / I3Units.second)
+        # Ensure no zeros
+        powerPermW += 1e-100 * min([i for i in powerPermW if i > 0])
+        # dBmHz
+        dBmHz = 10 * np.log10(powerPermW / df * I3Units.hertz)
+
+        low, high = LoopBandEdges(dBmHz)
+
+        plotFreqs = freqs[low : high + 1]
+        plotAmps = dBmHz[low : high + 1]
+
+        ax.plot(plotFreqs, plotAmps, color=plotColor, label=plotLabel)
+
+        ylow, yhigh = ax.get_ylim()
+
+        ax.set_xlabel("Frequency [" + self.freqUnitName + "]")
+        ax.set_xlim(freqs[0], freqs[plotBins])
+
+        ax.set_ylabel("Amplitude [dBm Hz]")
+
+
+def BenchAntennaToggle(args):
+    # Latency of the isADC toggle: former redraw of the waveform axes versus in place update
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    from util.Antenna import Antenna, BandEdges, DBmPerHz
+
+    antenna = Antenna()
+    channels = [SyntheticTrace(args.samples, seed) for seed in (0, 1)]
+    fig = plt.figure()
+    axlist = {
+        "waveforms_time": fig.add_subplot(2, 1, 1),
+        "waveforms_freq": fig.add_subplot(2, 1, 2),
+    }
+
+    times, hilbert, signal, freqs, spectrum = channels[0]
+    dBmHz = DBmPerHz(freqs, spectrum, antenna.freqUnit)
+    assert BandEdges(dBmHz) == LoopBandEdges(dBmHz)
+    loop = Timeit(lambda: LoopBandEdges(dBmHz), args.repeat)
+    vectorized = Timeit(lambda: BandEdges(dBmHz), args.repeat)
+    print("Band edges, {} bins".format(len(dBmHz)))
+    print("  loop       {:8.3f} ms".format(loop * 1e3))
+    print("  vectorized {:8.3f} ms".format(vectorized * 1e3))
+
+    former = FormerAntennaPlots(antenna)
+
+    def FormerPath():
+        # Cleared axes, waveforms converted again (SyntheticTrace, an FFT of the trace, stands in
+        # for AntDataMapToPython without the radcube list conversion) and the former plots
+        for ax in axlist.values():
+            ax.clear()
+            ax.xaxis.set_ticks_position("bottom")
+            ax.yaxis.set_ticks_position("left")
+        antenna.isADC = not antenna.isADC
+        products = [SyntheticTrace(args.samples, seed) for seed in (0, 1)]
+        former.TimeFreqDbPlot(products, axlist, 1, "RadioTAXIWaveform")
+
+    def InPlace():
+        antenna.isADC = not antenna.isADC
+        antenna.TimeFreqDbPlot(channels, axlist, 1, "RadioTAXIWaveform")
+
+    print("isADC toggle, {} samples per channel".format(args.samples))
+    for name, toggle in [("former path", FormerPath), ("in place", InPlace)]:
+        for ax in axlist.values():
+            ax.clear()
+        toggle()
+        update = Timeit(toggle, args.repeat)
+        withDraw = Timeit(lambda: (toggle(), fig.canvas.draw()), args.repeat)
+        print(
+            "  {:12s} {:8.3f} ms, with the canvas draw {:8.3f} ms".format(
+                name, update * 1e3, withDraw * 1e3
+            )
+        )
+
+
+def LoopFromPulseMap(pulseMap, hlc=True):
+    # Pulses appended one by one to lists, the former PulseSeries.FromPulseMap
+    from util.Detector import PulseSeries
+
+    keys, counts, time, charge = [], [], [], []
+    for key in pulseMap.keys():
+        series = pulseMap[key]
+        if not len(series):
+            continue
+        keys.append(key)
+        counts.append(len(series))
+        for pulse in series:
+            time.append(pulse.time)
+            charge.append(pulse.charge)
+    return PulseSeries(keys, time, charge, np.full(len(time), hlc), counts)
+
+
+def SyntheticPulseMap(nPulses, seed=0):
+    # I3RecoPulseSeriesMap with nPulses spread over DOMs of 1 to 10 pulses
+    from icecube import dataclasses, icetray
+
+    rng = np.random.default_rng(seed)
+    pulseMap = dataclasses.I3RecoPulseSeriesMap()
+    dom = 0
+    while nPulses > 0:
+        count = min(int(rng.integers(1, 11)), nPulses)
+        series = dataclasses.I3RecoPulseSeries()
+        for time in np.sort(rng.uniform(0, 5000, count)):
+            pulse = dataclasses.I3RecoPulse()
+            pulse.time = time
+            pulse.charge = rng.exponential(1.0)
+            pulse.width = 3.0
+            pulse.flags = 1
+            series.append(pulse)
+        pulseMap[icetray.OMKey(dom // 60 + 1, dom % 60 + 1)] = series
+        dom += 1
+        nPulses -= count
+    return pulseMap
+
+
+def BenchPulseExtraction(args):
+    # Conversion of pulse maps into a PulseSeries: one pulse at a time versus one np.fromiter pass
+    from util.Detector import PulseSeries
+
+    for nPulses in args.pulses:
+        pulseMap = SyntheticPulseMap(nPulses)
+        reference = LoopFromPulseMap(pulseMap)
+        bulk = PulseSeries.FromPulseMap(pulseMap)
+        assert np.array_equal(reference.time, bulk.time)
+        assert np.array_equal(reference.charge, bulk.charge)
+        assert np.array_equal(reference.offsets, bulk.offsets)
+        loop = Timeit(lambda: LoopFromPulseMap(pulseMap), args.repeat)
+        fromiter = Timeit(lambda: PulseSeries.FromPulseMap(pulseMap), args.repeat)
+        print(
+            "{:6d} pulses: loop {:8.3f} ms, bulk {:8.3f} ms".format(
+                nPulses, loop * 1e3, fromiter * 1e3
+            )
+        )
+
+
+def SyntheticLayouts(seed=0):
+    # Detector layouts in x, y (m) where a grid of about one point per cell is uneven
+    rng = np.random.default_rng(seed)
+    strings = rng.uniform(-600, 600, (86, 2))
+    return {
+        "uniform": rng.uniform(-1000, 1000, (5000, 2)),
+        "line": np.column_stack([np.linspace(0, 3000, 3000), np.zeros(3000)]),
+        "thin band": np.column_stack(
+            [rng.uniform(0, 10000, 4000), rng.uniform(0, 5, 4000)]
+        ),
+        "strings": np.repeat(strings, 60, axis=0) + rng.normal(0, 0.5, (5160, 2)),
+    }
+
+
+def BenchSpatialIndex(args):
+    # Nearest point of the grid index and of SpatialIndex versus a brute force search
+    from util.SpatialIndex import GridIndex, SpatialIndex
+
+    rng = np.random.default_rng(args.seed)
+    for name, points in SyntheticLayouts(args.seed).items():
+        # Queries inside the layout and up to one extent away from it
+        low, high = points.min(axis=0), points.max(axis=0)
+        extent = np.maximum(high - low, 1.0)
+        queries = rng.uniform(low - extent, high + extent, (args.queries, 2))
+        queries[: args.queries // 2] = points[
+            rng.integers(0, len(points), args.queries // 2)
+        ] + rng.normal(0, 1, (args.queries // 2, 2))
+
+        bruteForce = [np.hypot(*(points - q).T).min() for q in queries]
+        results = []
+        for indexName, index in [
+            ("grid", GridIndex(points)),
+            ("SpatialIndex", SpatialIndex(points)),
+        ]:
+            times = []
+            for query, expected in zip(queries, bruteForce):
+                start = time.perf_counter()
+                distance, row = index.Nearest(query)
+                times.append(time.perf_counter() - start)
+                assert np.isclose(distance, expected)
+                assert np.isclose(np.hypot(*(points[row] - query)), expected)
+            results.append(
+                "{} median {:.3f} ms, max {:.3f} ms".format(
+                    indexName, np.median(times) * 1e3, np.max(times) * 1e3
+                )
+            )
+        print("{:9s} {:5d} points: {}".format(name, len(points), ", ".join(results)))
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    toggle = subparsers.add_parser(
+        "antenna-toggle", help="isADC toggle and dBm/Hz band edges of the waveforms"
+    )
+    toggle.add_argument(
+        "--samples",
+        type=int,
+        default=4096,
+        help="Samples per channel (a full RadioTAXI trace by default)",
+    )
+    toggle.add_argument("--repeat", type=int, default=20)
+    toggle.set_defaults(function=BenchAntennaToggle)
+
+    pulses = subparsers.add_parser(
+        "pulse-extraction", help="Conversion of I3RecoPulseSeriesMaps into PulseSeries"
+    )
+    pulses.add_argument("--pulses", type=int, nargs="+", default=[100, 1000, 10000])
+    pulses.add_argument("--repeat", type=int, default=20)
+    pulses.set_defaults(function=BenchPulseExtraction)
+
+    spatial = subparsers.add_parser(
+        "spatial-index",
+        help="Nearest detector queries of the spatial index against a brute force search",
+    )
+    spatial.add_argument("--queries", type=int, default=400)
+    spatial.add_argument("--seed", type=int, default=0)
+    spatial.set_defaults(function=BenchSpatialIndex)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    args.function(args)
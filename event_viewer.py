@@ -8,6 +8,13 @@ how to run:
 
     make sure to have the GCD file first (with and I3Geometry frame. NO I3GeometryDiff supported) and then the file(s) with Q and P frames..
 
+    to jump directly to a given event (or skip the first N Q/P frames) use
+    python3 event_viewer.py GCDfile.i3(.gz) dataFile.i3(.gz) --event RUN:EVENT (--skip N)
+    the first time a frame index is written next to each input file, later runs seek directly to the frame.
+
+    to save the display of every Q/P frame without opening a window (one process per core)
+    python3 event_viewer.py GCDfile.i3(.gz) dataFile.i3(.gz) --batch OUTDIR (--batch-format pdf --processes N)
+
 In the MainLoop the files fed are read and the canvas in surface_canvas.py is called where all the plots are made.
 
 __authors__ = 
@@ -18,10 +25,17 @@ Contact us on slack
 """
 
 import argparse
+import functools
 from icecube.icetray.i3logging import log_fatal
-from icecube import icetray, dataio
+from icecube import icetray
 
 from util import surface_canvas
+from util.FrameIndex import IterFrames, ReadFrameAt
+from util.Prefetcher import FramePrefetcher, PreparedFrame
+from util.EventCache import EventCache
+from util.BatchRender import BatchRenderer
+from util.GeometryCache import GeometryCache, ExtractGeometry
+from util.FrameCatalog import FrameCatalog
 
 # Load the detector types
 from util.Scintillator import Scintillator
@@ -104,10 +118,85 @@ def get_args():
         help="Scintillator keys to show",
         nargs="+",
     )
+    parser.add_argument(
+        "--event",
+        type=parse_event,
+        default=None,
+        help="Start directly at the Q/P frame with this RUN:EVENT (uses a frame index next to the input files)",
+    )
+    parser.add_argument(
+        "--skip",
+        type=int,
+        default=0,
+        help="Number of Q/P frames to skip before the first one shown (uses a frame index next to the input files)",
+    )
+    parser.add_argument(
+        "--prefetch",
+        type=int,
+        default=4,
+        help="Number of frames read and extracted ahead in the background (0 to disable)",
+    )
+    parser.add_argument(
+        "--prefetch-mb",
+        type=float,
+        default=1024,
+        help="Maximum memory (MB) held by the frames read ahead",
+    )
+    parser.add_argument(
+        "--antenna-workers",
+        type=int,
+        default=2,
+        help="Number of threads computing the waveforms of all the antennas when a frame is shown (0 to disable)",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="OUTDIR",
+        default=None,
+        help="Save the display of every Q/P frame to OUTDIR without opening a window",
+    )
+    parser.add_argument(
+        "--batch-format",
+        default="png",
+        help="Image format of the batch mode (png, pdf, ...)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help="Number of processes used in batch mode (default: number of cores)",
+    )
+    parser.add_argument(
+        "--geometry-cache",
+        metavar="DIR",
+        default=None,
+        help="Directory of the cached detector geometries (default: ~/.cache/event_viewer/geometry)",
+    )
+    parser.add_argument(
+        "--no-geometry-cache",
+        action="store_true",
+        help="Always extract the geometry from the GCD file",
+    )
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=512,
+        help="Maximum memory (MB) of the events kept to go back to (p or b N)",
+    )
     args = parser.parse_args()
     return args
 
 
+def parse_event(value):
+    # Converts RUN:EVENT into a tuple of two ints
+    try:
+        run_id, event_id = value.split(":")
+        return int(run_id), int(event_id)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "Expected RUN:EVENT (e.g. 122200:4567), got {}".format(value)
+        )
+
+
 def ParseOptions(frame, particleKeys, paramsKeys, detectors, framesOfChoise):
     print("Option to change:")
     print("0: keys in frame")
@@ -130,9 +219,8 @@ def ParseOptions(frame, particleKeys, paramsKeys, detectors, framesOfChoise):
         user_response = input("Enter number: ")
         if int(user_response) == 0:
             print("Available particles:")
-            for line in str(frame).split("\n"):
-                if "I3Particle" in line:
-                    print("\t", line.split()[0])
+            for key in FrameCatalog.Of(frame).KeysOfType("I3Particle"):
+                print("\t", key)
             print("Current particles are", particleKeys)
             user_response = input(
                 "Enter desired keys. Note first particle will be used to draw LDFs: "
@@ -190,14 +278,51 @@ def set_detector_keys(detectors, args):
     return detectors
 
 
+def LoadFromHistory(key, cache):
+    # Gets an event already shown from the cache, or reads it again from its file
+    prepared = cache.Get(key)
+    if prepared is None:
+        path, position = key
+        prepared = PreparedFrame(path, position, ReadFrameAt(path, position))
+    return prepared
+
+
+def ShowEvent(canvas, prepared, cache, prefetcher):
+    # Extracts the data of the detectors (unless it is still valid) and draws the event
+    frame = prepared.frame
+    if prepared.measuredData is None or prepared.generation != prefetcher.generation:
+        prepared.measuredData = {
+            det.name: det.ExtractMeasuredData(frame) for det in canvas.detectors
+        }
+        prepared.generation = prefetcher.generation
+    canvas.update_DAQ_or_P_frame(
+        frame, prepared.measuredData, (prepared.path, prepared.position)
+    )
+    cache.Put((prepared.path, prepared.position), prepared)
+
+
+def stop_threads(prefetcher, detectors):
+    # Reading ahead of the frames and precomputing of the waveforms
+    prefetcher.Stop()
+    for det in detectors:
+        det.Stop()
+
+
+def make_detectors(args):
+    antenna = Antenna()
+    # The waveforms are only shown when clicking an antenna, not in batch mode
+    if args.batch is None:
+        antenna.precomputeWorkers = args.antenna_workers
+    detectors = [Scintillator(), IceTop(), antenna]
+    if args.inice:
+        detectors.append(InIce())
+    return set_detector_keys(detectors, args)
+
+
 def MainLoop():
     args = get_args()
-    detectors = [Scintillator(), IceTop(), Antenna()]
     if args.inice:
         check_matplotlib_version()
-        detectors.append(InIce())
-    detectors = set_detector_keys(detectors, args)
-
     particleKeys = args.particlekeys
     paramsKeys = args.paramskeys
 
@@ -207,73 +332,150 @@ def MainLoop():
     if "P" in args.frames.upper():
         framesToView.append(icetray.I3Frame.Physics)
 
+    geometryCache = None
+    if not args.no_geometry_cache:
+        geometryCache = GeometryCache(args.geometry_cache)
+
+    if args.batch is not None:
+        import matplotlib
+
+        matplotlib.use("Agg", force=True)
+        renderer = BatchRenderer(
+            functools.partial(make_detectors, args),
+            particleKeys,
+            paramsKeys,
+            args.batch,
+            args.batch_format,
+            args.processes,
+            geometryCache,
+        )
+        renderer.Run(
+            IterFrames(args.infile, framesToView, args.event, args.skip), framesToView
+        )
+        return
+
+    detectors = make_detectors(args)
     canvas = surface_canvas.SurfaceCanvas(detectors, particleKeys, paramsKeys)
     canvas.fig.show()
     cid = canvas.fig.canvas.mpl_connect("button_press_event", canvas.ArrayOnClick)
     gFrameSeen = False
-    for file in args.infile:
-        for frame in dataio.I3File(file):
+    prefetcher = FramePrefetcher(
+        IterFrames(args.infile, framesToView, args.event, args.skip),
+        detectors,
+        framesToView,
+        depth=args.prefetch,
+        maxMB=args.prefetch_mb,
+    )
+    frames = iter(prefetcher)
+    cache = EventCache(args.cache_mb)
+
+    # (path, position) of the Q/P frames shown so far and the one currently shown
+    history = []
+    current = -1
+    while True:
+        if current + 1 < len(history):
+            # Moving forward again after going back
+            current += 1
+            prepared = LoadFromHistory(history[current], cache)
+        else:
+            prepared = next(frames, None)
+            if prepared is None:
+                break
+            frame = prepared.frame
             if frame.Stop == icetray.I3Frame.Geometry:
                 if "I3GeometryDiff" in frame.keys():
-                    Warning(
-                        "I3GeometryDiff is not supported. Please use a GCD file without I3GeometryDiff."
+                    print(
+                        "WARNING: I3GeometryDiff is not supported. Please use a GCD file without I3GeometryDiff."
                     )
                     continue
                 gFrameSeen = True
-                print("You are visualizing a %s frame" % frame.Stop)
-
-                canvas.update_geometry_frame(frame)
             elif frame.Stop in framesToView:
                 if not gFrameSeen:
                     log_fatal(
                         "While reading {}, hit a {} frame before finding a Geometry frame. \n"
-                        "Please feed a GCD file first.".format(file, frame.Stop)
+                        "Please feed a GCD file first.".format(prepared.path, frame.Stop)
                     )
-                print("You are visualizing a %s frame" % frame.Stop)
-
-                canvas.update_DAQ_or_P_frame(frame)
+                history.append((prepared.path, prepared.position))
+                current = len(history) - 1
             else:
                 continue
 
-            canvas.fig.canvas.draw()
+        frame = prepared.frame
+        isGeometry = frame.Stop == icetray.I3Frame.Geometry
+        print("You are visualizing a %s frame" % frame.Stop)
+        if isGeometry:
+            geometry = ExtractGeometry(
+                canvas.detectors, frame, prepared.path, prepared.position, geometryCache
+            )
+            canvas.update_geometry_frame(frame, geometry)
+        else:
+            ShowEvent(canvas, prepared, cache, prefetcher)
+
+        canvas.fig.canvas.draw()
+
+        back = 0
+        while True:
+            user_response = input(
+                "Enter:\n "
+                "q to quit,\n "
+                "return to continue,\n "
+                "p for the previous event,\n "
+                "b N to jump back N events,\n "
+                "r to refresh,\n "
+                "s to save,\n "
+                "or o for options:\n"
+            )
 
-            while True:
+            if user_response.lower() == "q":
+                stop_threads(prefetcher, canvas.detectors)
+                exit()
+            elif user_response.lower() == "o":
+                temp_frames = ParseOptions(
+                    frame,
+                    canvas.particleKeys,
+                    canvas.paramsKeys,
+                    canvas.detectors,
+                    framesToView,
+                )
+                if temp_frames is not None:
+                    framesToView = temp_frames
+                # The frames read ahead were extracted with the old options
+                prefetcher.Invalidate(framesToView)
+
+            elif user_response.lower() == "r":
+                if isGeometry:
+                    canvas.update_geometry_frame(frame, geometry)
+                else:
+                    ShowEvent(canvas, prepared, cache, prefetcher)
+                canvas.fig.canvas.draw()
+            elif user_response.lower() == "s":
                 user_response = input(
-                    "Enter:\n "
-                    "q to quit,\n "
-                    "return to continue,\n "
-                    "r to refresh,\n "
-                    "s to save,\n "
-                    "or o for options:\n"
+                    "Enter path to save + file name (e.g. /home/user/img.png(.pdf)): "
                 )
+                canvas.fig.savefig(str(user_response), bbox_inches="tight")
+                print("Image saved to: ", str(user_response))
+            elif user_response.lower() == "p" or user_response.lower().startswith(
+                "b "
+            ):
+                try:
+                    back = 1 if user_response.lower() == "p" else int(user_response[2:])
+                except ValueError:
+                    print("Please enter b followed by the number of events, e.g. b 5")
+                    continue
+                if not history or back <= 0:
+                    back = 0
+                    print("There is no previous event to go back to")
+                    continue
+                break
+            else:
+                break
 
-                if user_response.lower() == "q":
-                    exit()
-                elif user_response.lower() == "o":
-                    temp_frames = ParseOptions(
-                        frame,
-                        canvas.particleKeys,
-                        canvas.paramsKeys,
-                        canvas.detectors,
-                        framesToView,
-                    )
-                    if temp_frames is not None:
-                        framesToView = temp_frames
-
-                elif user_response.lower() == "r":
-                    if frame.Stop == icetray.I3Frame.Geometry:
-                        canvas.update_geometry_frame(frame)
-                    elif frame.Stop in framesToView:
-                        canvas.update_DAQ_or_P_frame(frame)
-                    canvas.fig.canvas.draw()
-                elif user_response.lower() == "s":
-                    user_response = input(
-                        "Enter path to save + file name (e.g. /home/user/img.png(.pdf)): "
-                    )
-                    canvas.fig.savefig(str(user_response), bbox_inches="tight")
-                    print("Image saved to: ", str(user_response))
-                else:
-                    break
+        if back:
+            # A geometry frame is not in the history, going back 1 from it shows the last event
+            target = current - back + (1 if isGeometry else 0)
+            current = max(target, 0) - 1
+
+    stop_threads(prefetcher, canvas.detectors)
 
 
 if __name__ == "__main__":
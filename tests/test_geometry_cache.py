@@ -0,0 +1,70 @@
+"""
+Round trip of the detector geometries through the GeometryCache, with empty detector types.
+"""
+
+import numpy as np
+import pytest
+
+from util.GeometryCache import ExtractGeometry, GeometryCache
+
+
+class Layout(object):
+    # Stands for a Detector: keys of keyWidth ints and positions of count detectors
+    def __init__(self, name, keyWidth, count):
+        self.name = name
+        self.keys = np.arange(count * keyWidth, dtype=np.int64).reshape(count, keyWidth)
+        self.positions = np.arange(3.0 * count).reshape(count, 3)
+        self.extracted = False
+
+    def ExtractFromGFrame(self, frame):
+        self.extracted = True
+
+    def GetGeometryArrays(self):
+        return self.keys, self.positions
+
+
+LAYOUTS = [
+    ("InIce", 3, 0),
+    ("IceTop", 3, 5),
+    ("Scintillators", 2, 0),
+    ("Antenna", 2, 0),
+]
+
+
+@pytest.fixture
+def gcd(tmp_path):
+    path = tmp_path / "GCD.i3"
+    path.write_bytes(b"geometry")
+    return str(path)
+
+
+def test_round_trip_with_empty_detector_types(tmp_path, gcd):
+    cache = GeometryCache(str(tmp_path / "cache"))
+    extracted = ExtractGeometry(
+        [Layout(*layout) for layout in LAYOUTS], None, gcd, 0, cache
+    )
+    loaded = cache.Load(gcd, 0)
+    assert loaded is not None
+    for name, keyWidth, count in LAYOUTS:
+        keys, positions = loaded[name]
+        assert keys.shape == (count, keyWidth)
+        assert positions.shape == (count, 3)
+        assert np.array_equal(keys, extracted[name][0])
+        assert np.array_equal(positions, extracted[name][1])
+
+
+def test_cached_geometry_is_not_extracted_again(tmp_path, gcd):
+    cache = GeometryCache(str(tmp_path / "cache"))
+    ExtractGeometry([Layout(*layout) for layout in LAYOUTS], None, gcd, 0, cache)
+    layouts = [Layout(*layout) for layout in LAYOUTS]
+    ExtractGeometry(layouts, None, gcd, 0, cache)
+    assert not any(layout.extracted for layout in layouts)
+    assert cache.Load(gcd, 1) is None
+
+
+def test_empty_key_array_of_a_geometry_table():
+    pytest.importorskip("icecube")
+    from util.Detector import GeometryTable
+
+    assert GeometryTable().KeyArray(3).shape == (0, 3)
+    assert GeometryTable([(1, 2)], [(0.0, 0.0, 0.0)]).KeyArray(2).shape == (1, 2)
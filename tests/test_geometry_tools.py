@@ -0,0 +1,75 @@
+"""
+The I3Particle wrappers and the string segments of GeometryTools, with IceTray only.
+"""
+
+import numpy as np
+import pytest
+
+dataclasses = pytest.importorskip("icecube.dataclasses")
+
+from util.GeometryTools import (  # noqa: E402
+    ProjectToObslev,
+    ProjectToObslevArray,
+    StringSegments,
+    get_plane_delays,
+    get_plane_times,
+    get_radii,
+    get_radius,
+)
+
+
+@pytest.fixture
+def particles():
+    rng = np.random.default_rng(1)
+    particles = []
+    for _ in range(5):
+        particle = dataclasses.I3Particle()
+        particle.pos = dataclasses.I3Position(*rng.uniform(-500, 500, 3))
+        particle.dir = dataclasses.I3Direction(
+            rng.uniform(0, np.radians(70)), rng.uniform(0, 2 * np.pi)
+        )
+        particle.time = rng.uniform(0, 1e4)
+        particles.append(particle)
+    return particles
+
+
+def test_wrappers_match_the_scalar_functions(particles):
+    positions = np.random.default_rng(2).uniform(-1000, 1000, (50, 3))
+    times = np.zeros(len(positions))
+    radii = get_radii(particles, positions)
+    planeTimes = get_plane_times(particles, positions)
+    projected = ProjectToObslevArray(particles)
+    for ipart, particle in enumerate(particles):
+        assert np.allclose(
+            radii[ipart], [get_radius(particle, pos) for pos in positions]
+        )
+        assert np.allclose(get_radii(particle, positions), radii[ipart])
+        assert np.allclose(
+            get_plane_delays(particle, positions, times), planeTimes[ipart]
+        )
+        core = ProjectToObslev(dataclasses.I3Position(particle.pos), particle.dir)
+        assert np.allclose(projected[ipart], (core.x, core.y, core.z))
+
+
+def test_tanks_of_a_string_are_lone_points():
+    # In-ice DOMs of string 1, its two tanks (two DOMs each) and a tank of string 2
+    strings = [1, 1, 1, 1, 1, 1, 1, 2, 2]
+    positions = [
+        (0, 0, -100),
+        (0, 0, -117),
+        (0, 0, -134),
+        (0, 0, 1950),
+        (0, 0, 1950),
+        (10, 0, 1950),
+        (10, 0, 1950),
+        (5, 5, 1950),
+        (5, 5, 1950),
+    ]
+    segments, loneRows = StringSegments(strings, positions)
+    assert np.array_equal(segments, [[(0, 0, -134), (0, 0, -100)]])
+    assert len(loneRows) == 3
+    assert sorted(map(tuple, np.asarray(positions)[loneRows])) == [
+        (0, 0, 1950),
+        (5, 5, 1950),
+        (10, 0, 1950),
+    ]
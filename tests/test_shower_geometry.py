@@ -0,0 +1,124 @@
+"""
+The vectorized shower geometry against the former per-station loops of
+GeometryTools.get_radius, the plane front delay of IceTop and Scintillator
+and GeometryTools.ProjectToObslev, on random cores, directions and positions.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from util.ShowerGeometry import AxialRadii, AxisDirections, PlaneTimes, ProjectCores
+
+C = 0.299792458  # m/ns, I3Constants.c in IceCube units
+OBSLEV = 2834.0 - 883.9  # I3Constants.SurfaceElev - I3Constants.OriginElev
+
+
+def LoopRadius(particle, pos):
+    # GeometryTools.get_radius
+    x_c, y_c, z_c = particle.pos
+    nx, ny = particle.dir[:2]
+    abs_x_sq = (pos[0] - x_c) ** 2 + (pos[1] - y_c) ** 2 + (pos[2] - z_c) ** 2
+    n_prod_x = (
+        nx * (pos[0] - x_c)
+        + ny * (pos[1] - y_c)
+        - np.sqrt(1.0 - nx * nx - ny * ny) * (pos[2] - z_c)
+    )
+    return np.sqrt(abs_x_sq - n_prod_x * n_prod_x)
+
+
+def LoopPlaneDelays(particle, positions, times, nz):
+    # Plane front delays of the former IceTop and Scintillator loop, direction (dir.x, dir.y, nz)
+    core = np.asarray(particle.pos)
+    nDir = np.array([particle.dir[0], particle.dir[1], nz])
+    delays = []
+    for pos, t in zip(positions, times):
+        relPos = pos - core
+        delay = (
+            particle.time
+            + (nDir[0] * relPos[0] + nDir[1] * relPos[1] - nDir[2] * relPos[2]) / C
+        )
+        delays.append(delay - t)
+    return np.array(delays)
+
+
+def LoopProjectToObslev(particle):
+    # GeometryTools.ProjectToObslev
+    point = np.asarray(particle.pos)
+    return point + np.asarray(particle.dir) * (point[2] - OBSLEV) / np.cos(
+        particle.zenith
+    )
+
+
+@pytest.fixture
+def event():
+    rng = np.random.default_rng(0)
+    particles = []
+    for _ in range(10):
+        zenith = rng.uniform(0, np.radians(70))
+        azimuth = rng.uniform(0, 2 * np.pi)
+        # I3Direction of a shower coming from (zenith, azimuth)
+        direction = (
+            -np.sin(zenith) * np.cos(azimuth),
+            -np.sin(zenith) * np.sin(azimuth),
+            -np.cos(zenith),
+        )
+        particles.append(
+            SimpleNamespace(
+                pos=tuple(rng.uniform(-500, 500, 3)),
+                dir=direction,
+                zenith=zenith,
+                time=rng.uniform(0, 1e4),
+            )
+        )
+    cores = np.array([p.pos for p in particles])
+    dirs = AxisDirections([p.dir[0] for p in particles], [p.dir[1] for p in particles])
+    positions = rng.uniform(-1000, 1000, (200, 3))
+    times = rng.uniform(0, 1e4, len(positions))
+    return particles, cores, dirs, positions, times
+
+
+def test_axis_directions_are_downgoing_unit_vectors(event):
+    particles, cores, dirs, positions, times = event
+    assert np.allclose(np.linalg.norm(dirs, axis=1), 1)
+    assert np.allclose(dirs, [p.dir for p in particles])
+
+
+def test_axial_radii_match_get_radius(event):
+    particles, cores, dirs, positions, times = event
+    radii = AxialRadii(cores, dirs, positions)
+    assert radii.shape == (len(particles), len(positions))
+    for particle, expected in zip(particles, radii):
+        assert np.allclose(expected, [LoopRadius(particle, pos) for pos in positions])
+
+
+def test_plane_delays_match_the_former_loop(event):
+    particles, cores, dirs, positions, times = event
+    coreTimes = np.array([p.time for p in particles])
+    delays = PlaneTimes(cores, dirs, coreTimes, positions, C) - times
+    for particle, expected in zip(particles, delays):
+        nz = np.sqrt(1 - particle.dir[0] ** 2 - particle.dir[1] ** 2)
+        assert np.allclose(expected, LoopPlaneDelays(particle, positions, times, nz))
+
+
+def test_plane_delays_differ_from_the_former_loop_by_its_z_component(event):
+    # The former loop took dir.y as the z component of the direction (nDir = (x, y, y)),
+    # the kernels use -sqrt(1 - nx^2 - ny^2) as get_radius does
+    particles, cores, dirs, positions, times = event
+    coreTimes = np.array([p.time for p in particles])
+    delays = PlaneTimes(cores, dirs, coreTimes, positions, C) - times
+    for particle, expected in zip(particles, delays):
+        literal = LoopPlaneDelays(particle, positions, times, particle.dir[1])
+        nz = np.sqrt(1 - particle.dir[0] ** 2 - particle.dir[1] ** 2)
+        relZ = positions[:, 2] - particle.pos[2]
+        assert np.allclose(literal - expected, (nz - particle.dir[1]) * relZ / C)
+
+
+def test_projected_cores_match_project_to_obslev(event):
+    particles, cores, dirs, positions, times = event
+    fullDirs = np.array([p.dir for p in particles])
+    cosZenith = np.cos([p.zenith for p in particles])
+    projected = ProjectCores(cores, fullDirs, cosZenith, OBSLEV)
+    assert np.allclose(projected, [LoopProjectToObslev(p) for p in particles])
+    assert np.allclose(projected[:, 2], OBSLEV)
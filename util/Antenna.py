@@ -1,5 +1,12 @@
-from .Detector import Detector, PulseData
-from .GeometryTools import get_radius
+from .Detector import Detector
+from .EventCache import LRUCache
+from .GeometryTools import get_radius, GetI3Geometries
+from .Markers import DataMarkerCollection
+from .FrameCatalog import FrameCatalog
+from .Decimate import MinMaxPyramid
+
+import concurrent.futures
+import threading
 
 import numpy as np
 
@@ -13,17 +20,50 @@ from icecube import radcube
 from icecube import taxi_reader
 
 from matplotlib.collections import PatchCollection
-import matplotlib.patches as mpatches
 import matplotlib.path as mpath
 
 """
 TODO list:
 1. The overall antenna plots need to be double checked.
-2. The isADC function is SUPER slow. We should check if it can be optimized 
-3. LDF and time plots
+2. LDF and time plots
 """
 
 
+def DBmPerHz(freqs, amps, freqUnit):
+    # Spectrum amplitudes converted to dBm/Hz (50 Ohm), freqs are in freqUnit
+    df = (freqs[1] - freqs[0]) * freqUnit
+
+    # Convert to power
+    pz = (np.asarray(amps) * np.sqrt(2.0) * df) ** 2
+    power = pz / (50 * I3Units.ohm)
+    # Power per 1mW
+    powerPermW = power / (1.0e-3 * I3Units.joule / I3Units.second)
+    # Ensure no zeros
+    positive = powerPermW[powerPermW > 0]
+    if len(positive):
+        powerPermW += 1e-100 * np.min(positive)
+    # dBmHz
+    return 10 * np.log10(powerPermW / df * I3Units.hertz)
+
+
+def BandEdges(dBmHz):
+    # First and last bins of the band: the last jump of the smoothed spectrum
+    # above +30 dB (low edge) and the last drop below -30 dB (high edge)
+    low = 1
+    high = len(dBmHz)
+    ibin = np.arange(1, len(dBmHz) - 3)
+    step = 0.5 * (dBmHz[ibin + 1] + dBmHz[ibin + 2]) - 0.5 * (
+        dBmHz[ibin] + dBmHz[ibin - 1]
+    )
+    rises = ibin[(step > 30) & (dBmHz[ibin + 1] > -300)]
+    drops = ibin[(step < -30) & (dBmHz[ibin] > -300)]
+    if len(rises):
+        low = rises[-1] + 1
+    if len(drops):
+        high = drops[-1]
+    return low, high
+
+
 class Antenna(Detector):
     """docstring for Antenna"""
 
@@ -34,6 +74,7 @@ class Antenna(Detector):
         self.antennas_pulse_patches = PatchCollection([])
         self.color = "b"
         self.name = "Antenna"
+        self.keyWidth = 2
         self.timeUnit = I3Units.nanosecond
         self.timeUnitName = "ns"
         self.freqUnit = I3Units.megahertz
@@ -45,6 +86,20 @@ class Antenna(Detector):
         self.antenna_lables = []
         self.AntennaStationID = "None"
         self.isADC = False
+        # Lines of the waveform plots, updated in place when isADC is toggled
+        self.waveformLines = {}
+        # Min/max pyramids of the lines, the drawn vertices are recomputed for the visible x range
+        self.waveformPyramids = {}
+        self.xlimCallbacks = {}
+        self.eventID = None
+        # Waveform products (time series, Hilbert envelope, spectrum) already computed,
+        # filled by the main thread and the precompute threads
+        self.waveformCache = LRUCache(64 * 1024 * 1024)
+        self.cacheLock = threading.Lock()
+        # Threads computing the products of all the antennas when a frame is loaded (0 to disable)
+        self.precomputeWorkers = 0
+        self.executor = None
+        self.pending = {}
 
     def GetDefaultAntennaKeys(self):
         return [
@@ -60,37 +115,124 @@ class Antenna(Detector):
     def ExtractFromGFrame(self, frame):
         assert frame.Stop == icetray.I3Frame.Geometry
 
-        self.positions.clear()
-
-        # Check all things in geometry frame I3Geometry
-        for key in frame.keys():
-            if key == "I3GeometryDiff":
-                continue
-            i3geometry = frame[key]
+        keys = []
+        positions = []
+        for i3geometry in GetI3Geometries(frame):
             for antkey, ant in i3geometry.antennageo:
                 pos = ant.position
-                self.positions[antkey] = np.asarray((pos.x, pos.y, pos.z))
+                keys.append(self.GeometryKey(antkey))
+                positions.append((pos.x, pos.y, pos.z))
+        self.SetGeometry(keys, positions)
+
+    def GeometryKey(self, key):
+        return (key.GetStationID(), key.GetAntennaID())
+
+    def FrameKey(self, geometryKey):
+        # AntennaKey used in the antenna maps of the frame
+        return dataclasses.AntennaKey(*geometryKey)
 
     def DrawGeometry(self, ax):
-        antenna_patches = []
-        for pos in self.positions.values():
-            antenna_patches.append(self.antennaPatches(pos[:2]))
-        self.antennas_position_patches = PatchCollection(
-            antenna_patches, match_original=True
+        # All the antennas share the same marker path, placed at their positions
+        self.antennas_position_patches = DataMarkerCollection(
+            ax,
+            self.antennaPath(),
+            offsets=self.geometry.positions,
+            sizes=1.0,
+            edgecolor="None",
+            facecolor=self.color,
+            alpha=1.0,
         )
-        ax.add_collection(self.antennas_position_patches)
+        ax.add_collection(self.antennas_position_patches, autolim=False)
+        self.antennas_position_patches.set_visible(self.shouldDraw)
+
+    def DrawHits(self, ax):
+        return
 
     def Draw3dGeometry(self, ax):
-        for pos in self.positions.values():
-            ax.scatter(pos[0], pos[1], pos[2], marker="X", c="b")
+        x, y, z = self.geometry.positions.T
+        ax.scatter(x, y, z, marker="X", c="b")
 
-    def ExtractFromQPFrame(self, frame):
-        self.measuredData.clear()
+    def Draw3dHits(self, ax):
+        return
 
+    def ExtractMeasuredData(self, frame):
+        measuredData = {}
+        catalog = FrameCatalog.Of(frame)
         for framekey in self.antennakeys:
-            if framekey in frame.keys() and len(frame[framekey]) != 0:
+            if framekey in catalog and len(frame[framekey]) != 0:
                 ant_map = frame[framekey]
-                self.measuredData[framekey] = ant_map
+                measuredData[framekey] = ant_map
+        return measuredData
+
+    def ExtractFromQPFrame(self, frame, measuredData=None):
+        super(Antenna, self).ExtractFromQPFrame(frame, measuredData)
+        if self.frameSource is not None:
+            # The frame is identified by its place in its file, headers can repeat across files
+            self.eventID = ("source",) + tuple(self.frameSource)
+        else:
+            # Frame of unknown source: the entries of the previous ones are dropped
+            self.eventID = ("frame", id(frame))
+            self.Stop()
+            with self.cacheLock:
+                stale = [
+                    key for key in self.waveformCache.entries if key[0][0] == "frame"
+                ]
+                for key in stale:
+                    self.waveformCache.Pop(key)
+        self.__Precompute()
+
+    def Stop(self):
+        # Cancels the products not started yet and waits for those being computed
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.pending = {}
+
+    def __Precompute(self):
+        # Hands every (antenna, channel) of the maps of the frame to a new thread pool,
+        # the products of the previous frame not started yet are cancelled.
+        # The threads put the products in the cache, so all of them are within its budget
+        self.Stop()
+        if self.precomputeWorkers <= 0:
+            return
+        if self.executor is None:
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.precomputeWorkers
+            )
+
+        for key, antMap in self.measuredData.items():
+            isEField = isinstance(antMap, dataclasses.EFieldTimeSeriesMap)
+            if not isEField and not isinstance(antMap, dataclasses.I3AntennaDataMap):
+                continue
+            for antennaKey in antMap.keys():
+                if isEField:
+                    channels = [None]
+                else:
+                    channelKeys = antMap[antennaKey].keys()
+                    channels = [ch for ch in (0, 1) if ch in channelKeys]
+                for channel in channels:
+                    cacheKey = (
+                        self.eventID,
+                        key,
+                        self.GeometryKey(antennaKey),
+                        channel,
+                    )
+                    with self.cacheLock:
+                        cached = cacheKey in self.waveformCache
+                    if not cached:
+                        self.pending[cacheKey] = self.executor.submit(
+                            self.__CacheProducts, cacheKey, antMap, antennaKey, channel
+                        )
+
+    def __CacheProducts(self, cacheKey, antMap, antennaKey, channel):
+        products = self.__Products(antMap, antennaKey, channel)
+        with self.cacheLock:
+            self.waveformCache.Put(cacheKey, products)
+
+    def __Products(self, antMap, antennaKey, channel):
+        if channel is None:
+            return self.I3RadVector3DToPython(antMap, antennaKey)
+        return self.AntDataMapToPython(antMap, channel, antennaKey)
 
     def DrawLDF(self, ax, particle):
         pass
@@ -112,8 +254,9 @@ class Antenna(Detector):
 
     def GetAntennaLabels(self, frame):
         antenna_lables = []
+        catalog = FrameCatalog.Of(frame)
         for key in self.antennakeys:
-            if key in frame.keys():
+            if key in catalog:
                 for antkey in frame[key].keys():
                     if (
                         not [antkey.GetAntennaID(), antkey.GetStationID()]
@@ -124,23 +267,9 @@ class Antenna(Detector):
                         )
         self.antenna_lables = antenna_lables
 
-    def AntennaOnClick(self, click_pos, frame, axlist):
-        # Finds the antenna closest to the point that is clicked
-        # and uses it to update the plots
-
-        if self.positions == {}:
-            return
-        antennaKeys = []
-        antennaPos = []
-        for antKey in self.positions.keys():
-            antennaKeys.append(antKey)
-        for pos in self.positions.values():
-            antennaPos.append(pos[:2])
-        antennaPos = np.asarray(antennaPos)
-        antennaKeys = np.asarray(antennaKeys)
-        distance = np.sum((antennaPos - click_pos) ** 2, axis=1)
-        _min = np.argmin(distance)
-        self.AntennaStationID = antennaKeys[_min]
+    def OnClick(self, row, frame, axlist):
+        # Uses the antenna of the geometry row clicked on to update the plots
+        self.AntennaStationID = self.FrameKey(self.geometry.keys[row])
         self.__fill_text_box(frame, axlist["info_radio"])
         self.DrawAntennasPlots(frame, axlist)
 
@@ -150,14 +279,17 @@ class Antenna(Detector):
 
         key = self.selectedKey
         if self.selectedKey != "":
-            if key in frame.keys():
+            if key in FrameCatalog.Of(frame):
                 if not self.AntennaStationID in frame[key].keys():
                     return
                 # TODO: I did not find a more efficient way to do it #Federico
                 if isinstance(frame[key], dataclasses.EFieldTimeSeriesMap):
-                    self.TimeEfieldPlot(frame[key], axlist, 1, key)
+                    self.TimeEfieldPlot(
+                        self.WaveformProducts(frame, key, None), axlist, 1, key
+                    )
                 elif isinstance(frame[key], dataclasses.I3AntennaDataMap):
-                    self.TimeFreqDbPlot(frame[key], axlist, 1, key)
+                    channels = [self.WaveformProducts(frame, key, ch) for ch in (0, 1)]
+                    self.TimeFreqDbPlot(channels, axlist, 1, key)
                 else:
                     log_fatal(
                         "Key: ({}) is type ({}). I don't know what this is!".format(
@@ -166,13 +298,30 @@ class Antenna(Detector):
                     )
         return
 
-    def TimeFreqDbPlot(self, antDataMap, axlist, plotFrac, plotLabel):
-        (times, hilbert1, signal1, freqs, f_signal1) = self.AntDataMapToPython(
-            antDataMap, 0
-        )
-        (times, hilbert2, signal2, freqs, f_signal2) = self.AntDataMapToPython(
-            antDataMap, 1
-        )
+    def WaveformProducts(self, frame, key, channel):
+        # Arrays of AntDataMapToPython (I3RadVector3DToPython if channel is None) for the selected
+        # antenna, computed once per (event, map key, antenna, channel): no FFT is repeated when
+        # re-clicking the antenna or toggling isADC
+        cacheKey = (self.eventID, key, self.GeometryKey(self.AntennaStationID), channel)
+        with self.cacheLock:
+            products = self.waveformCache.Get(cacheKey)
+        if products is None:
+            # Computed in the background: waits for this item only, or computes it here if not started
+            future = self.pending.pop(cacheKey, None)
+            if future is not None and not future.cancel():
+                concurrent.futures.wait([future])
+                with self.cacheLock:
+                    products = self.waveformCache.Get(cacheKey)
+        if products is None:
+            products = self.__Products(frame[key], self.AntennaStationID, channel)
+            with self.cacheLock:
+                self.waveformCache.Put(cacheKey, products)
+        return products
+
+    def TimeFreqDbPlot(self, channels, axlist, plotFrac, plotLabel):
+        # channels holds the arrays of AntDataMapToPython for channels 0 and 1
+        times, hilbert1, signal1, freqs, f_signal1 = channels[0]
+        times, hilbert2, signal2, freqs, f_signal2 = channels[1]
 
         ax = axlist["waveforms_time"]
 
@@ -185,6 +334,10 @@ class Antenna(Detector):
             self.MakeHilbertPlot(
                 ax, times, hilbert2, plotFrac, "g", plotLabel + " Ch.2"
             )
+        else:
+            self.__RemoveLine(ax, "hilbert", "k")
+            self.__RemoveLine(ax, "hilbert", "g")
+        self.__Rescale(ax, symmetric=not self.isADC)
         ax.legend(prop={"size": 5})
 
         ax = axlist["waveforms_freq"]
@@ -196,20 +349,20 @@ class Antenna(Detector):
             self.MakedBmHzPlot(ax, freqs, f_signal1, plotFrac, "b", plotLabel + " Ch.1")
             self.MakedBmHzPlot(ax, freqs, f_signal2, plotFrac, "r", plotLabel + " Ch.2")
 
+        self.__Rescale(ax, logIfLarge=self.isADC)
         ax.legend(prop={"size": 5})
 
-    def TimeEfieldPlot(self, vectorMap, axlist, plotFrac, plotLabel):
-        # Makes a plot of the Efield times series for the passed in values
+    def TimeEfieldPlot(self, products, axlist, plotFrac, plotLabel):
+        # Makes a plot of the Efield times series for the passed in values (arrays of I3RadVector3DToPython)
 
-        times, tsX, tsY, tsZ, freqs, specX, specY, specZ = self.I3RadVector3DToPython(
-            vectorMap
-        )
+        times, tsX, tsY, tsZ, freqs, specX, specY, specZ = products
 
         ax = axlist["waveforms_time"]
 
         self.MakeTimePlot(ax, times, tsX, plotFrac, "b", plotLabel + " Grid W")
         self.MakeTimePlot(ax, times, tsY, plotFrac, "r", plotLabel + " Grid N")
         self.MakeTimePlot(ax, times, tsZ, plotFrac, "k", plotLabel + " Vertical")
+        self.__Rescale(ax, symmetric=not self.isADC)
         ax.legend(prop={"size": 5})
 
         ax = axlist["waveforms_freq"]
@@ -217,15 +370,19 @@ class Antenna(Detector):
         self.MakeFreqPlot(ax, freqs, specX, plotFrac, "b", plotLabel + " Grid W")
         self.MakeFreqPlot(ax, freqs, specY, plotFrac, "r", plotLabel + " Grid N")
         self.MakeFreqPlot(ax, freqs, specZ, plotFrac, "k", plotLabel + " Vertical")
+        self.__Rescale(ax, logIfLarge=True)
         ax.legend(prop={"size": 5})
 
-    def I3RadVector3DToPython(self, vectorMap):
+    def I3RadVector3DToPython(self, vectorMap, antennaKey=None):
         # Converts the waveform data into numpy arrays
         # The times and freqs (x-axis values) are converted into the requested units here
+        # antennaKey defaults to the selected antenna
 
-        if not self.AntennaStationID in vectorMap.keys():
+        if antennaKey is None:
+            antennaKey = self.AntennaStationID
+        if not antennaKey in vectorMap.keys():
             logging.log_warn(
-                "Antenna key ({}) not found in the map!".format(self.AntennaStationID)
+                "Antenna key ({}) not found in the map!".format(antennaKey)
             )
             return (
                 0,
@@ -238,7 +395,7 @@ class Antenna(Detector):
                 0,
             )
 
-        fftData = dataclasses.FFTData3D(vectorMap[self.AntennaStationID])
+        fftData = dataclasses.FFTData3D(vectorMap[antennaKey])
         times, tsX, tsY, tsZ = radcube.RadTraceToPythonList(fftData.GetTimeSeries())
         freqs, specX, specY, specZ = radcube.RadTraceToPythonList(
             fftData.GetFrequencySpectrum()
@@ -248,29 +405,41 @@ class Antenna(Detector):
         specY = np.abs(specY)
         specZ = np.abs(specZ)
 
-        times /= self.timeUnit
-        freqs /= self.freqUnit
-
-        return times, tsX, tsY, tsZ, freqs, specX, specY, specZ
+        times = np.asarray(times) / self.timeUnit
+        freqs = np.asarray(freqs) / self.freqUnit
+
+        return (
+            times,
+            np.asarray(tsX),
+            np.asarray(tsY),
+            np.asarray(tsZ),
+            freqs,
+            specX,
+            specY,
+            specZ,
+        )
 
-    def AntDataMapToPython(self, antDataMap, channel_no):
+    def AntDataMapToPython(self, antDataMap, channel_no, antennaKey=None):
         # Converts the waveform data into numpy arrays
         # The times and freqs (x-axis values) are converted into the requested units here
+        # antennaKey defaults to the selected antenna
 
+        if antennaKey is None:
+            antennaKey = self.AntennaStationID
         # Make sure that this antenna key is in the map
-        if not self.AntennaStationID in antDataMap.keys():
+        if not antennaKey in antDataMap.keys():
             logging.log_warn(
-                "Antenna key ({}) not found in the map!".format(self.AntennaStationID)
+                "Antenna key ({}) not found in the map!".format(antennaKey)
             )
             return [], [], [], [], []
 
-        channelMap = antDataMap[self.AntennaStationID]
+        channelMap = antDataMap[antennaKey]
 
         # Make sure that this channel key is in the map
         if not channel_no in channelMap.keys():
             logging.log_warn(
                 "Channel key ({}) not found in the map of antenna key ({})!".format(
-                    channel_no, self.AntennaStationID
+                    channel_no, antennaKey
                 )
             )
             return [], [], [], [], []
@@ -283,46 +452,81 @@ class Antenna(Detector):
         freqs, spectrumpy = radcube.RadTraceToPythonList(fft.GetFrequencySpectrum())
 
         spectrumpy = np.abs(spectrumpy)
-        times /= self.timeUnit
-        freqs /= self.freqUnit
-
-        return times, hilbertpy, timeseriespy, freqs, spectrumpy
+        times = np.asarray(times) / self.timeUnit
+        freqs = np.asarray(freqs) / self.freqUnit
+
+        return times, np.asarray(hilbertpy), np.asarray(timeseriespy), freqs, spectrumpy
+
+    def __SetLine(self, ax, kind, x, y, color, label, **kwargs):
+        # Draws a line of the waveform plots, or updates in place the one already drawn.
+        # Only the min/max per pixel column of the trace is drawn (see Decimate.py)
+        key = (ax, kind, color)
+        pyramid = MinMaxPyramid(x, y)
+        self.waveformPyramids[key] = pyramid
+        if len(pyramid.x):
+            x, y = pyramid.View(pyramid.x[0], pyramid.x[-1], self.__Columns(ax))
+        line = self.waveformLines.get(key)
+        # Lines are dropped with the axis content when the waveforms are reset
+        if line is None or line.axes is not ax or line not in ax.lines:
+            (line,) = ax.plot(x, y, color=color, label=label, **kwargs)
+            self.waveformLines[key] = line
+        else:
+            line.set_data(x, y)
+            line.set_label(label)
+
+        # Clearing the axis also drops its callbacks
+        if self.xlimCallbacks.get(ax) is not ax.callbacks:
+            ax.callbacks.connect("xlim_changed", self.__OnXlimChanged)
+            self.xlimCallbacks[ax] = ax.callbacks
+
+    def __RemoveLine(self, ax, kind, color):
+        self.waveformPyramids.pop((ax, kind, color), None)
+        line = self.waveformLines.pop((ax, kind, color), None)
+        if line is not None and line.axes is ax:
+            line.remove()
+
+    def __Columns(self, ax):
+        return max(int(ax.get_window_extent().width), 100)
+
+    def __OnXlimChanged(self, ax):
+        # Zoom or pan: the vertices of the lines are taken again from their pyramid
+        x0, x1 = sorted(ax.get_xlim())
+        columns = self.__Columns(ax)
+        for key, line in self.waveformLines.items():
+            if key[0] is ax and line.axes is ax and len(self.waveformPyramids[key].x):
+                line.set_data(*self.waveformPyramids[key].View(x0, x1, columns))
+
+    def __Rescale(self, ax, symmetric=False, logIfLarge=False):
+        # y range of the lines currently drawn, symmetric around 0 for the time series in voltage
+        # Automatically converts to logscale if the values are large
+        if ax.get_yscale() != "linear":
+            ax.set_yscale("linear")
+        ax.relim()
+        ax.set_autoscaley_on(True)
+        ax.autoscale_view(scalex=False)
+        ylow, yhigh = ax.get_ylim()
+        if symmetric:
+            ymax = max(abs(ylow), abs(yhigh))
+            ax.set_ylim(-ymax * 1.02, ymax * 1.02)
+        elif logIfLarge and yhigh >= 1000:
+            ax.set_yscale("log")
 
     def MakeTimePlot(self, ax, times, amps, plotFrac, plotColor, plotLabel):
         # Plots the time series from the passed in values
 
         plotBins = int(len(times) * plotFrac) - 1
-
-        if not self.isADC:
-            amps = np.array(amps)
-            amps /= self.voltageUnit
+        amps = np.asarray(amps[0:plotBins])
 
         if self.isADC:
-            mean = np.mean(amps[0:plotBins])
-            ax.plot(
-                times[0:plotBins],
-                amps[0:plotBins] - mean,
-                color=plotColor,
-                label=plotLabel,
-            )
+            amps = amps - np.mean(amps)
+            label = plotLabel
+            ax.set_ylabel("Amplitude [ADC]")
         else:
-            rms = np.std(amps[0:plotBins])
-            ax.plot(
-                times[0:plotBins],
-                amps[0:plotBins],
-                color=plotColor,
-                label=plotLabel + " - RMS: {0:0.3f}".format(rms),
-            )
-
-        if not self.isADC:
-            thisMax = max(amps[0:plotBins])
-            thisMin = min(amps[0:plotBins])
-            ylow, yhigh = ax.get_ylim()
-            ymax = max([ylow, yhigh, thisMax, -thisMin])
-            ax.set_ylim(-ymax * 1.02, ymax * 1.02)
+            amps = amps / self.voltageUnit
+            label = plotLabel + " - RMS: {0:0.3f}".format(np.std(amps))
             ax.set_ylabel("Amplitude [" + self.voltageUnitName + "]")
-        else:
-            ax.set_ylabel("Amplitude [ADC]")
+
+        self.__SetLine(ax, "time", times[0:plotBins], amps, plotColor, label)
 
         ax.set_xlabel("Time [" + self.timeUnitName + "]")
         ax.set_xlim(times[0], times[plotBins])
@@ -331,16 +535,18 @@ class Antenna(Detector):
         # Draws the Hilbert envelope from the passed in values
 
         plotBins = int(len(times) * plotFrac) - 1
+        amps = np.asarray(amps[0:plotBins])
 
         if not self.isADC:
-            amps = np.array(amps)
-            amps /= self.voltageUnit
+            amps = amps / self.voltageUnit
 
-        ax.plot(
+        self.__SetLine(
+            ax,
+            "hilbert",
             times[0:plotBins],
-            amps[0:plotBins],
-            color=plotColor,
-            label=plotLabel,
+            amps,
+            plotColor,
+            plotLabel,
             linestyle="dashed",
         )
 
@@ -354,18 +560,14 @@ class Antenna(Detector):
 
     def MakeFreqPlot(self, ax, freqs, amps, plotFrac, plotColor, plotLabel):
         # Plots the frequency spectrum from the passed in values
-        # Automatically converts to logscale if the values are large
 
         plotBins = int(len(freqs) * plotFrac) - 1
+        amps = np.asarray(amps[1:plotBins])
 
         if not self.isADC:
-            amps = np.array(amps)
-            amps /= self.specUnit
+            amps = amps / self.specUnit
 
-        ax.plot(freqs[1:plotBins], amps[1:plotBins], color=plotColor, label=plotLabel)
-        ylow, yhigh = ax.get_ylim()
-        if yhigh >= 1000:
-            ax.set_yscale("log")
+        self.__SetLine(ax, "freq", freqs[1:plotBins], amps, plotColor, plotLabel)
         ax.set_xlabel("Frequency [" + self.freqUnitName + "]")
         ax.set_xlim(freqs[0], freqs[plotBins])
 
@@ -379,43 +581,13 @@ class Antenna(Detector):
 
         plotBins = int(len(freqs) * plotFrac) - 1
 
-        amps = np.array(amps)
-        df = (freqs[1] - freqs[0]) * self.freqUnit
-
-        # Convert to power
-        pz = (amps * np.sqrt(2.0) * df) ** 2
-        power = pz / (50 * I3Units.ohm)
-        # Power per 1mW
-        powerPermW = power / (1.0e-3 * I3Units.joule / I3Units.second)
-        # Ensure no zeros
-        powerPermW += 1e-100 * min([i for i in powerPermW if i > 0])
-        # dBmHz
-        dBmHz = 10 * np.log10(powerPermW / df * I3Units.hertz)
-
-        low = 1
-        high = len(dBmHz)
-        for ibin in range(1, len(dBmHz) - 3):
-            if (
-                0.5 * (dBmHz[ibin + 1] + dBmHz[ibin + 2])
-                - 0.5 * (dBmHz[ibin] + dBmHz[ibin - 1])
-                > 30
-                and dBmHz[ibin + 1] > -300
-            ):
-                low = ibin + 1
-            if (
-                0.5 * (dBmHz[ibin + 1] + dBmHz[ibin + 2])
-                - 0.5 * (dBmHz[ibin] + dBmHz[ibin - 1])
-                < -30
-                and dBmHz[ibin] > -300
-            ):
-                high = ibin
+        dBmHz = DBmPerHz(freqs, amps, self.freqUnit)
+        low, high = BandEdges(dBmHz)
 
         plotFreqs = freqs[low : high + 1]
         plotAmps = dBmHz[low : high + 1]
 
-        ax.plot(plotFreqs, plotAmps, color=plotColor, label=plotLabel)
-
-        ylow, yhigh = ax.get_ylim()
+        self.__SetLine(ax, "freq", plotFreqs, plotAmps, plotColor, plotLabel)
 
         ax.set_xlabel("Frequency [" + self.freqUnitName + "]")
         ax.set_xlim(freqs[0], freqs[plotBins])
@@ -427,8 +599,8 @@ class Antenna(Detector):
         self.antennas_position_patches.set_visible(self.shouldDraw)
         self.antennas_pulse_patches.set_visible(self.shouldDraw)
 
-    def antennaPatches(self, pos, x=10.0, y=10.0, rotation=0.0):
-        # Draws an antenna patch like a greek cross with and internal square of side length off_set * 2
+    def antennaPath(self, x=10.0, y=10.0):
+        # Path of the antenna marker centered on (0, 0), a greek cross with and internal square of side length off_set * 2
         Path = mpath.Path
         off_set = 2.0
         path_data = [
@@ -447,11 +619,7 @@ class Antenna(Detector):
             (Path.CLOSEPOLY, [off_set, off_set]),
         ]
         codes, verts = zip(*path_data)
-        path = mpath.Path(verts + pos, codes)
-        patch = mpatches.PathPatch(
-            path, edgecolor="None", facecolor=self.color, alpha=1.0
-        )
-        return patch
+        return mpath.Path(verts, codes)
 
     def __fill_text_box(self, frame, ax):
         # Writes the currently selected antenna into the text box
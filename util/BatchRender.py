@@ -0,0 +1,162 @@
+"""
+Headless rendering of the event displays of many frames.
+No window is opened and there is no user input: every worker process of a multiprocessing
+pool builds its own SurfaceCanvas on the Agg backend, receives the geometry frame once
+when it starts, and then saves one image per Q/P frame it is handed.
+"""
+
+import os
+import time
+import multiprocessing
+
+import matplotlib
+
+from icecube import icetray
+
+from .GeometryCache import ExtractGeometry
+
+# State of each worker process, set once by the pool initializer
+_canvas = None
+_outdir = None
+_fmt = None
+
+
+def _InitWorker(
+    makeDetectors, particleKeys, paramsKeys, geometryFrame, geometry, outdir, fmt
+):
+    global _canvas, _outdir, _fmt
+    matplotlib.use("Agg", force=True)
+    from .surface_canvas import SurfaceCanvas
+
+    _canvas = SurfaceCanvas(makeDetectors(), list(particleKeys), list(paramsKeys))
+    _canvas.update_geometry_frame(geometryFrame, geometry)
+    _outdir = outdir
+    _fmt = fmt
+
+
+def OutputName(frame, path, position, fmt):
+    # Run/event IDs when available, otherwise the input file name and frame position
+    if "I3EventHeader" in frame:
+        header = frame["I3EventHeader"]
+        return "Run{}_Event{}_SubEvent{}_{}.{}".format(
+            header.run_id, header.event_id, header.sub_event_id, frame.Stop.id, fmt
+        )
+    name = os.path.basename(path).split(".")[0]
+    return "{}_Frame{}_{}.{}".format(name, position, frame.Stop.id, fmt)
+
+
+def _RenderFrame(path, position, frame):
+    try:
+        _canvas.update_DAQ_or_P_frame(frame)
+        name = os.path.join(_outdir, OutputName(frame, path, position, _fmt))
+        _canvas.fig.savefig(name, bbox_inches="tight")
+    except Exception as error:
+        return None, "{} frame {}: {}".format(path, position, error)
+    return name, None
+
+
+class BatchRenderer(object):
+    """
+    Fans the Q/P frames out to a pool of worker processes.
+    The pool is (re)started at each geometry frame, whose positions are extracted (or loaded
+    from the geometry cache) once here and sent to each worker when it starts.
+    At most 2 frames per worker are in flight to keep the memory bounded.
+    """
+
+    def __init__(
+        self,
+        makeDetectors,
+        particleKeys,
+        paramsKeys,
+        outdir,
+        fmt="png",
+        processes=None,
+        geometryCache=None,
+    ):
+        self.makeDetectors = makeDetectors
+        self.particleKeys = particleKeys
+        self.paramsKeys = paramsKeys
+        self.outdir = outdir
+        self.fmt = fmt
+        self.processes = processes or multiprocessing.cpu_count()
+        self.geometryCache = geometryCache
+        self.pool = None
+        self.pending = []
+        self.nDone = 0
+        self.nFailed = 0
+        self.startTime = None
+
+    def __StartPool(self, geometryFrame, path, position):
+        self.__ClosePool()
+        geometry = ExtractGeometry(
+            self.makeDetectors(), geometryFrame, path, position, self.geometryCache
+        )
+        self.pool = multiprocessing.Pool(
+            self.processes,
+            initializer=_InitWorker,
+            initargs=(
+                self.makeDetectors,
+                self.particleKeys,
+                self.paramsKeys,
+                geometryFrame,
+                geometry,
+                self.outdir,
+                self.fmt,
+            ),
+        )
+
+    def __ClosePool(self):
+        if self.pool is None:
+            return
+        while self.pending:
+            self.__Collect()
+        self.pool.close()
+        self.pool.join()
+        self.pool = None
+
+    def __Collect(self):
+        name, error = self.pending.pop(0).get()
+        if error is not None:
+            self.nFailed += 1
+            print("Could not render", error)
+        else:
+            self.nDone += 1
+            if self.nDone % 100 == 0:
+                self.__PrintThroughput()
+
+    def __PrintThroughput(self):
+        elapsed = time.time() - self.startTime
+        print(
+            "Rendered {} events in {:.1f} s ({:.2f} events/s with {} processes)".format(
+                self.nDone, elapsed, self.nDone / max(elapsed, 1e-9), self.processes
+            )
+        )
+
+    def Run(self, frames, framesToView):
+        os.makedirs(self.outdir, exist_ok=True)
+        self.startTime = time.time()
+        for path, position, frame in frames:
+            if frame.Stop == icetray.I3Frame.Geometry:
+                if "I3GeometryDiff" in frame.keys():
+                    print(
+                        "WARNING: I3GeometryDiff is not supported. Please use a GCD file without I3GeometryDiff."
+                    )
+                    continue
+                self.__StartPool(frame, path, position)
+            elif frame.Stop in framesToView:
+                if self.pool is None:
+                    print(
+                        "WARNING: {} frame at position {} of {} found before a Geometry frame, skipped".format(
+                            frame.Stop, position, path
+                        )
+                    )
+                    continue
+                self.pending.append(
+                    self.pool.apply_async(_RenderFrame, (path, position, frame))
+                )
+                if len(self.pending) >= 2 * self.processes:
+                    self.__Collect()
+        self.__ClosePool()
+        self.__PrintThroughput()
+        if self.nFailed:
+            print("{} events could not be rendered".format(self.nFailed))
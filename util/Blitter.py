@@ -0,0 +1,116 @@
+"""
+Redraws only the axes changed by an interactive callback instead of the whole figure.
+After each full draw the area (tight box, labels included) of every axis is stored.
+A callback then passes the axes it changed: their area is painted with the figure
+background, they are drawn again together with the axes overlapping that area,
+and only this area is copied to the screen.
+Backends that cannot blit fall back to a full draw.
+"""
+
+import math
+
+from matplotlib.backend_bases import DrawEvent
+from matplotlib.patches import Rectangle
+from matplotlib.transforms import Bbox, IdentityTransform
+
+
+class BlitManager(object):
+    def __init__(self, fig):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.bboxes = {}
+        self.blitting = False
+        # Blank figure background, painted in display coordinates over the area to redraw
+        self.background = Rectangle(
+            (0, 0),
+            1,
+            1,
+            transform=IdentityTransform(),
+            facecolor=fig.get_facecolor(),
+            edgecolor="none",
+            antialiased=False,
+        )
+        self.background.set_figure(fig)
+        self.canvas.mpl_connect("draw_event", self.OnDraw)
+
+    def CanBlit(self):
+        return (
+            getattr(self.canvas, "supports_blit", False)
+            and hasattr(self.canvas, "get_renderer")
+            and len(self.bboxes) > 0
+        )
+
+    def OnDraw(self, event):
+        # Full draw of the figure (first show, resize, zoom...): the area of each axis is stored again
+        if self.blitting:
+            return
+        self.bboxes = {}
+        for ax in self.fig.axes:
+            bbox = self.__TightBbox(ax, event.renderer)
+            if bbox is not None:
+                self.bboxes[ax] = bbox
+
+    def __TightBbox(self, ax, renderer):
+        if not ax.get_visible():
+            return None
+        bbox = ax.get_tightbbox(renderer)
+        if bbox is None:
+            return None
+        # Whole pixels, with a margin for the antialiasing
+        return Bbox.from_extents(
+            math.floor(bbox.x0) - 2,
+            math.floor(bbox.y0) - 2,
+            math.ceil(bbox.x1) + 2,
+            math.ceil(bbox.y1) + 2,
+        )
+
+    def Update(self, axes):
+        """Redraws the given axes (and the ones they overlap) and blits their area"""
+        if not self.CanBlit():
+            self.canvas.draw()
+            self.canvas.flush_events()
+            return
+
+        renderer = self.canvas.get_renderer()
+        # Area of the axes before (old tight box) and after (new tight box) the change
+        boxes = []
+        for ax in axes:
+            old = self.bboxes.pop(ax, None)
+            new = self.__TightBbox(ax, renderer)
+            boxes += [bbox for bbox in [old, new] if bbox is not None]
+            if new is not None:
+                self.bboxes[ax] = new
+
+        # The axes overlapping these areas are drawn as well, and their area is added in turn
+        redraw = set(ax for ax in axes if ax in self.bboxes)
+        grown = True
+        while grown:
+            grown = False
+            for ax, bbox in self.bboxes.items():
+                if ax not in redraw and any(bbox.overlaps(box) for box in boxes):
+                    redraw.add(ax)
+                    boxes.append(bbox)
+                    grown = True
+        boxes = [Bbox.intersection(box, self.fig.bbox) for box in boxes]
+        boxes = [box for box in boxes if box is not None]
+        if not boxes:
+            return
+
+        for box in boxes:
+            self.background.set_bounds(box.x0, box.y0, box.width, box.height)
+            self.fig.draw_artist(self.background)
+        for ax in self.fig.axes:
+            if ax in redraw:
+                self.fig.draw_artist(ax)
+        for box in boxes:
+            self.canvas.blit(box)
+        self.canvas.flush_events()
+
+        # Listeners of draw_event (e.g. the MultiCursor) take their background from the updated canvas
+        self.blitting = True
+        try:
+            self.canvas.callbacks.process(
+                "draw_event", DrawEvent("draw_event", self.canvas, renderer)
+            )
+        finally:
+            self.blitting = False
@@ -0,0 +1,52 @@
+"""
+Min/max decimation of long traces for drawing.
+A MinMaxPyramid holds the minimum and maximum of the samples over blocks of 2, 4, 8, ...
+samples. For the visible x range it gives the level with about one block per pixel
+column and draws each block as a vertical min-max segment: the peaks stay exact and
+the number of vertices stays bounded (at most 4 per column) whatever the trace length.
+"""
+
+import math
+
+import numpy as np
+
+
+class MinMaxPyramid(object):
+    """x must be increasing. levels[k] holds (x, min, max) over blocks of 2**k samples"""
+
+    __slots__ = ("x", "y", "levels")
+
+    def __init__(self, x, y, minBlocks=64):
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.levels = [(self.x, self.y, self.y)]
+        low = high = self.y
+        block = 1
+        while len(low) > 2 * minBlocks:
+            if len(low) % 2:
+                low = np.append(low, low[-1])
+                high = np.append(high, high[-1])
+            low = np.minimum(low[0::2], low[1::2])
+            high = np.maximum(high[0::2], high[1::2])
+            block *= 2
+            self.levels.append((self.x[::block], low, high))
+
+    def View(self, x0, x1, columns):
+        """Vertices to draw for the x range [x0, x1] on an axis of columns pixels"""
+        n = len(self.x)
+        i0 = max(int(np.searchsorted(self.x, x0, side="left")) - 1, 0)
+        i1 = min(int(np.searchsorted(self.x, x1, side="right")) + 1, n)
+        level = 0
+        if i1 - i0 > 2 * columns:
+            level = min(int(math.log2((i1 - i0) / columns)), len(self.levels) - 1)
+        if level == 0:
+            return self.x[i0:i1], self.y[i0:i1]
+
+        block = 2**level
+        j0 = i0 // block
+        j1 = -(-i1 // block)
+        x, low, high = self.levels[level]
+        vertices = np.empty(2 * (j1 - j0))
+        vertices[0::2] = low[j0:j1]
+        vertices[1::2] = high[j0:j1]
+        return np.repeat(x[j0:j1], 2), vertices
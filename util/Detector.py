@@ -1,3 +1,14 @@
+import itertools
+import operator
+
+import numpy as np
+import matplotlib.pyplot as plt
+
+from .GeometryTools import get_radii, get_plane_delays
+from .SpatialIndex import SpatialIndex
+
+LC_FLAG = 1  # I3RecoPulse.PulseFlags.LC, the pulse is in local coincidence (HLC)
+
 class Detector(object):
   """Base class for individual detector types
      the implementations know how to get information
@@ -6,18 +17,286 @@ class Detector(object):
   def __init__(self):
     self.name = "DetectorNameUnset"
     self.shapes = ['o', 's', 'P', "X", "D", "*"]
-    self.positions = {}
+    self.geometry = GeometryTable()
     self.measuredData = {}
+    self.hits = {}
+    self.silent = {}
+    self.allHits = HitSummary.Concatenate([])
     self.shouldDraw = True   #Decides if this should be drawn
+    self.onSurface = True    #Drawn (and picked) in the array view
+    self.keyWidth = 3        #Length of the tuples of GeometryKey
+    self.frameSource = None  #(path, position) of the frame shown, None if unknown
     self.colorMapType = 'gist_rainbow'
 
-class PulseData(object):
-    __slots__ = ("t",
-                 "t_plane",
+  def Stop(self):
+    """Stops the threads of the detector, if any, when the viewer quits"""
+    pass
+
+  def GeometryKey(self, key):
+    """Tuple of ints identifying the geometry row of a key of the frame (OMKey, ScintKey, AntennaKey)"""
+    return tuple(key)
+
+  def SetGeometry(self, keys, positions):
+    self.geometry = GeometryTable(keys, positions)
+
+  def GetGeometryArrays(self):
+    """The extracted geometry as an (N, k) array of key tuples and an (N, 3) array of positions"""
+    return self.geometry.KeyArray(self.keyWidth), self.geometry.positions
+
+  def SetGeometryArrays(self, keys, positions):
+    """Restores the geometry from the arrays of GetGeometryArrays (instead of ExtractFromGFrame)"""
+    self.SetGeometry([tuple(key) for key in keys.tolist()], positions)
+
+  def HitRows(self, pulses):
+    """Geometry rows of the keys of a PulseSeries"""
+    return self.geometry.Rows([self.GeometryKey(key) for key in pulses.keys])
+
+  def HitPositions(self, pulses):
+    """(N, 3) positions of the keys of a PulseSeries"""
+    return self.geometry.positions[self.HitRows(pulses)]
+
+  def SummarizeHits(self):
+    """Computes once per frame the hit summary of each pulse key and of all of them together.
+       silent[framekey] is a boolean mask over the geometry rows of the detectors without pulses"""
+    cmap = plt.get_cmap(self.colorMapType)
+    self.hits = {}
+    self.silent = {}
+    for framekey, pulses in self.measuredData.items():
+      if isinstance(pulses, PulseSeries):
+        rows = self.HitRows(pulses)
+        self.hits[framekey] = HitSummary(rows, self.geometry.positions[rows],
+                                         pulses.TotalCharge(), pulses.FirstTime(), cmap)
+        self.silent[framekey] = ~self.geometry.Mask(rows)
+    self.allHits = HitSummary.Concatenate(list(self.hits.values()), cmap)
+
+  def PulsesOfRow(self, row):
+    """(framekey, times, charges) of the pulses of the detector of a geometry row, for each pulse key"""
+    pulses = []
+    for framekey, hits in self.hits.items():
+      index = np.flatnonzero(hits.rows == row)
+      if len(index):
+        series = self.measuredData[framekey]
+        start, end = series.offsets[index[0]], series.offsets[index[0] + 1]
+        pulses.append((framekey, series.time[start:end], series.charge[start:end]))
+    return pulses
+
+  def OnClick(self, row, frame, axlist):
+    """Shows the pulses of the detector of the geometry row clicked on"""
+    key = self.geometry.keys[row]
+    x, y, z = self.geometry.positions[row]
+    pulses = self.PulsesOfRow(row)
+
+    ax = axlist["info_radio"]
+    ax.clear()
+    ax.set_xticks([])
+    ax.set_yticks([])
+    words = "{} {}\n({:.1f}, {:.1f}, {:.1f}) m\n".format(self.name, key, x, y, z)
+    for framekey, time, charge in pulses:
+      words += "{}: {} pulses, charge {:.2f}\n".format(framekey, len(time), np.sum(charge))
+    if not pulses:
+      words += "No pulses\n"
+    ax.text(0.05, 0.95, words, ha="left", va="top", color="k", transform=ax.transAxes)
+
+    ax = axlist["waveforms_time"]
+    for icolor, (framekey, time, charge) in enumerate(pulses):
+      color = "C{}".format(icolor)
+      ax.vlines(time, 0, charge, color=color)
+      ax.plot(time, charge, "o", color=color, label=framekey)
+    if pulses:
+      ax.legend(prop={"size": 5})
+    ax.set_xlabel("Time [ns]")
+    ax.set_ylabel("Charge")
+
+  def ExtractMeasuredData(self, frame):
+    """Returns the data of this detector found in a Q/P frame.
+       It must not change the state of the detector since it also runs
+       ahead of the viewer in the prefetch thread"""
+    return {}
+
+  def ExtractFromQPFrame(self, frame, measuredData=None):
+    """Stores the data of the frame, if it was already extracted (e.g. prefetched) it is reused"""
+    if measuredData is None:
+      measuredData = self.ExtractMeasuredData(frame)
+    self.measuredData = measuredData
+    self.SummarizeHits()
+
+class PulseSeries(object):
+    """Columnar (struct of arrays) store of the pulses of many tanks/DOMs/panels.
+       The pulses of keys[i] are the entries offsets[i]:offsets[i+1] of the flat arrays,
+       dom holds for each pulse the index of its key. Keys without pulses are not stored."""
+    __slots__ = ("keys",
+                 "time",
+                 "charge",
+                 "width",
+                 "flags",
+                 "hlc",
+                 "dom",
+                 "offsets")
+
+    def __init__(self, keys, time, charge, hlc, counts, width=None, flags=None):
+        self.keys = list(keys)
+        self.time = np.asarray(time, dtype=float)
+        self.charge = np.asarray(charge, dtype=float)
+        self.width = np.zeros(len(self.time)) if width is None else np.asarray(width, dtype=float)
+        self.flags = np.zeros(len(self.time), dtype=np.int64) if flags is None else np.asarray(flags, dtype=np.int64)
+        self.hlc = np.asarray(hlc, dtype=bool)
+        counts = np.asarray(counts, dtype=np.int64)
+        self.offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.dom = np.repeat(np.arange(len(counts)), counts)
+
+    @classmethod
+    def FromPulseMap(cls, pulseMap, hlc=None):
+        # pulseMap is an I3RecoPulseSeriesMap (or anything mapping keys to series of pulses).
+        # The series are read once (items() instead of a lookup per key), then each field of
+        # all the pulses is read by one np.fromiter into an array of the known total size.
+        # hlc is taken from the LC bit of the flags, unless given for all the pulses
+        if hasattr(pulseMap, "items"):
+            items = pulseMap.items()
+        else:
+            items = ((key, pulseMap[key]) for key in pulseMap.keys())
+        keys, counts, allSeries = [], [], []
+        for key, series in items:
+            if not len(series):
+                continue
+            keys.append(key)
+            counts.append(len(series))
+            allSeries.append(series)
+        pulses = list(itertools.chain.from_iterable(allSeries))
+
+        def Column(field, dtype=float):
+            return np.fromiter(map(operator.attrgetter(field), pulses), dtype=dtype, count=len(pulses))
+
+        width, flags = None, None
+        if pulses and hasattr(pulses[0], "width"):
+            width = Column("width")
+            flags = Column("flags", np.int64)
+        if hlc is not None:
+            hlcColumn = np.full(len(pulses), hlc)
+        elif flags is not None:
+            hlcColumn = (flags & LC_FLAG) != 0
+        else:
+            hlcColumn = np.zeros(len(pulses), dtype=bool)
+        return cls(keys, Column("time"), Column("charge"), hlcColumn, counts, width, flags)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def Counts(self):
+        return np.diff(self.offsets)
+
+    def TotalCharge(self):
+        # Sum of the charges of the pulses of each key
+        if not len(self.keys):
+            return np.zeros(0)
+        return np.add.reduceat(self.charge, self.offsets[:-1])
+
+    def FirstTime(self):
+        # Time of the first pulse of each key
+        return self.time[self.offsets[:-1]]
+
+
+class GeometryTable(object):
+    """Positions of all the detectors of one type as an (N, 3) array.
+       keys[i] (a tuple of ints) is the key of row i and index maps each key back to its row."""
+
+    def __init__(self, keys=(), positions=None):
+        self.keys = list(keys)
+        if positions is None:
+            positions = np.zeros((0, 3))
+        self.positions = np.asarray(positions, dtype=float).reshape(len(self.keys), 3)
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        self.spatialIndex = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def Rows(self, keys):
+        # Rows of a batch of keys, all of them must be in the table
+        return np.fromiter((self.index[key] for key in keys), dtype=np.intp, count=len(keys))
+
+    def Mask(self, rows):
+        # Boolean mask over all the rows, True for the given rows
+        mask = np.zeros(len(self.keys), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def Nearest(self, point):
+        # (distance, row) of the detector closest to point in x, y, the index is built on the first call
+        if self.spatialIndex is None:
+            self.spatialIndex = SpatialIndex(self.positions[:, :2])
+        return self.spatialIndex.Nearest(point)
+
+    def KeyArray(self, width):
+        # (N, width) array of the keys, also for an empty table
+        return np.asarray(self.keys, dtype=np.int64).reshape(len(self.keys), width)
+
+
+def NormalizedTime(time):
+    # The time is set to 0 by subtracting the min and then it is normalized by dividing the max
+    if not len(time):
+        return np.zeros(0)
+    time = np.subtract(time, np.min(time))
+    return np.divide(time, np.max(time))
+
+
+def ParticleKey(particle):
+    return (particle.pos.x, particle.pos.y, particle.pos.z,
+            particle.dir.zenith, particle.dir.azimuth, particle.time)
+
+
+class HitSummary(object):
+    """Quantities derived from the hits of one frame, shared by all the draw methods:
+       geometry rows and positions, total charge, first time and its color in the time colormap.
+       The axial radius and plane front delay depend on the reference particle and are
+       recomputed only when SetParticle is called with a different particle."""
+    __slots__ = ("rows",
+                 "positions",
                  "charge",
-                 "hlc")
+                 "time",
+                 "colors",
+                 "particle",
+                 "radius",
+                 "delay")
+
+    def __init__(self, rows, positions, charge, time, cmap):
+        self.rows = np.asarray(rows, dtype=np.intp)
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self.charge = np.asarray(charge, dtype=float)
+        self.time = np.asarray(time, dtype=float)
+        self.colors = cmap(NormalizedTime(self.time))
+        self.particle = None
+        self.radius = None
+        self.delay = None
+
+    @classmethod
+    def Concatenate(cls, summaries, cmap=None):
+        # Summary of the hits of several pulse keys, the times are normalized all together
+        if cmap is None:
+            cmap = plt.get_cmap("gist_rainbow")
+        return cls(np.concatenate([np.zeros(0, dtype=np.intp)] + [s.rows for s in summaries]),
+                   np.concatenate([np.zeros((0, 3))] + [s.positions for s in summaries]),
+                   np.concatenate([np.zeros(0)] + [s.charge for s in summaries]),
+                   np.concatenate([np.zeros(0)] + [s.time for s in summaries]),
+                   cmap)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def ScaledSizes(self, minSize, maxSize):
+        # Sizes going from minSize to maxSize with the log10 of the charge
+        if not len(self.charge):
+            return np.zeros(0)
+        amps = np.log10(self.charge)
+        return minSize + (maxSize - minSize) * (amps - amps.min()) / (amps.max() - amps.min() + 0.01)
 
-    def __init__(self, t, charge, hlc):
-        self.t = t
-        self.charge = charge
-        self.hlc = hlc
+    def SetParticle(self, particle):
+        key = ParticleKey(particle)
+        if key == self.particle:
+            return
+        self.radius = get_radii(particle, self.positions)
+        self.delay = get_plane_delays(particle, self.positions, self.time)
+        self.particle = key
@@ -0,0 +1,95 @@
+"""
+Size-bounded LRU cache of the events already shown.
+Each entry holds the decoded frame and the data extracted by every detector,
+so that going back to an event costs neither the I3 decoding nor the pulse extraction.
+"""
+
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from .Prefetcher import FrameSizeBytes
+
+
+def EstimateBytes(obj, _seen=None):
+    # Rough recursive estimate of the memory held by the extracted data of a detector
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += EstimateBytes(key, _seen) + EstimateBytes(value, _seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for value in obj:
+            size += EstimateBytes(value, _seen)
+    elif hasattr(obj, "__slots__"):
+        for name in obj.__slots__:
+            size += EstimateBytes(getattr(obj, name, None), _seen)
+    elif hasattr(obj, "__dict__"):
+        size += EstimateBytes(vars(obj), _seen)
+    return size
+
+
+class LRUCache(object):
+    """Least recently used cache bounded by the total size (in bytes) of its entries"""
+
+    def __init__(self, maxBytes, sizeof=EstimateBytes):
+        self.maxBytes = maxBytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.totalBytes = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def Get(self, key, default=None):
+        if key not in self.entries:
+            return default
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def Put(self, key, value, nbytes=None):
+        self.Pop(key)
+        if nbytes is None:
+            nbytes = self.sizeof(value)
+        if nbytes > self.maxBytes:
+            return
+        self.entries[key] = value
+        self.sizes[key] = nbytes
+        self.totalBytes += nbytes
+        while self.totalBytes > self.maxBytes:
+            self.Pop(next(iter(self.entries)))
+
+    def Pop(self, key):
+        if key not in self.entries:
+            return None
+        self.totalBytes -= self.sizes.pop(key)
+        return self.entries.pop(key)
+
+    def Clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.totalBytes = 0
+
+
+class EventCache(LRUCache):
+    """LRU cache of PreparedFrame objects keyed by (path, position), bounded in MB"""
+
+    def __init__(self, maxMB):
+        super(EventCache, self).__init__(maxMB * 1024 * 1024)
+
+    def Put(self, key, prepared):
+        nbytes = prepared.nbytes or FrameSizeBytes(prepared.frame)
+        nbytes += EstimateBytes(prepared.measuredData)
+        super(EventCache, self).Put(key, prepared, nbytes)
@@ -0,0 +1,100 @@
+"""
+Catalog of the keys of a frame and of their types.
+It is built once per frame from the type names stored in the frame (frame.type_name),
+so no object is deserialized, and then answers "is this key present" and
+"which keys have this type" with dictionary lookups.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+
+
+def FrameReference(frame):
+    # Callable giving back the frame: a weak reference if the frame type supports them
+    try:
+        return weakref.ref(frame)
+    except TypeError:
+        return lambda: frame
+
+
+class RecentFrames(object):
+    """
+    Objects built once per frame (e.g. a FrameCatalog) for at most maxFrames frames.
+    The frames are held by weak references and an entry is dropped when its frame is deleted,
+    so the cache does not keep frames alive (nor their ids reused while in the cache).
+    Frames that cannot be weakly referenced are held strongly, only the last one.
+    The objects built must not hold a strong reference to their frame.
+    """
+
+    def __init__(self, maxFrames=8):
+        self.maxFrames = maxFrames
+        self.entries = OrderedDict()  # id(frame): (reference, object)
+        self.strongEntry = None
+        self.lock = threading.RLock()
+
+    def __Drop(self, key, reference):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] is reference:
+                del self.entries[key]
+
+    def Get(self, frame, build):
+        key = id(frame)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0]() is frame:
+                self.entries.move_to_end(key)
+                return entry[1]
+        value = build(frame)
+        with self.lock:
+            try:
+                reference = weakref.ref(frame, lambda ref: self.__Drop(key, ref))
+            except TypeError:
+                reference = FrameReference(frame)
+                if self.strongEntry is not None:
+                    self.__Drop(*self.strongEntry)
+                self.strongEntry = (key, reference)
+            self.entries[key] = (reference, value)
+            while len(self.entries) > self.maxFrames:
+                self.entries.popitem(last=False)
+        return value
+
+
+class FrameCatalog(object):
+    """Keys of a frame grouped by type name, e.g. KeysOfType("I3Particle")"""
+
+    __slots__ = ("types", "byType")
+
+    _recent = RecentFrames()
+
+    def __init__(self, frame):
+        self.types = {}
+        self.byType = {}
+        for key in frame.keys():
+            try:
+                typeName = frame.type_name(key)
+            except Exception:
+                typeName = ""
+            self.types[key] = typeName
+            self.byType.setdefault(typeName, []).append(key)
+
+    @classmethod
+    def Of(cls, frame):
+        """Catalog of the frame, built on the first call for this frame"""
+        return cls._recent.Get(frame, cls)
+
+    def __contains__(self, key):
+        return key in self.types
+
+    def __len__(self):
+        return len(self.types)
+
+    def keys(self):
+        return list(self.types.keys())
+
+    def TypeName(self, key):
+        return self.types.get(key)
+
+    def KeysOfType(self, typeName):
+        return list(self.byType.get(typeName, []))
@@ -0,0 +1,194 @@
+"""
+Random-access index of the frames in an I3 file.
+The index is stored in a sidecar file next to the input (input.i3.bz2 -> input.i3.bz2.idx.npz)
+and records for every frame its position in the file, its stop, run ID and event ID.
+It is rebuilt automatically when it no longer matches the input file (size or modification time).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from icecube import icetray, dataio
+
+
+class FrameIndex(object):
+    """Frame positions, stops and run/event IDs of a single I3 file"""
+
+    version = 1
+    suffix = ".idx.npz"
+
+    def __init__(self, path):
+        self.path = path
+        self.positions = np.zeros(0, dtype=np.int64)
+        self.stops = np.zeros(0, dtype="U1")
+        self.runs = np.zeros(0, dtype=np.int64)
+        self.events = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def Open(cls, path):
+        # Loads the sidecar index if it is still valid, otherwise it is (re)built and saved
+        index = cls(path)
+        if not index.Load():
+            print("Building frame index for", path)
+            index.Build()
+            index.Save()
+        return index
+
+    def SidecarPath(self):
+        return self.path + self.suffix
+
+    def __Signature(self):
+        stat = os.stat(self.path)
+        return np.asarray(
+            [self.version, stat.st_size, stat.st_mtime_ns], dtype=np.int64
+        )
+
+    def Load(self):
+        sidecar = self.SidecarPath()
+        if not os.path.exists(sidecar):
+            return False
+        try:
+            with np.load(sidecar) as data:
+                if not np.array_equal(data["signature"], self.__Signature()):
+                    return False
+                self.positions = data["positions"]
+                self.stops = data["stops"]
+                self.runs = data["runs"]
+                self.events = data["events"]
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def Save(self):
+        try:
+            np.savez(
+                self.SidecarPath(),
+                signature=self.__Signature(),
+                positions=self.positions,
+                stops=self.stops,
+                runs=self.runs,
+                events=self.events,
+            )
+        except OSError:
+            print(f"WARNING: could not write the frame index next to {self.path}")
+
+    def Build(self):
+        # Only the I3EventHeader is deserialized, all the other payloads are left untouched
+        positions, stops, runs, events = [], [], [], []
+        for position, frame in enumerate(dataio.I3File(self.path)):
+            run, event = -1, -1
+            if "I3EventHeader" in frame:
+                header = frame["I3EventHeader"]
+                run, event = header.run_id, header.event_id
+            positions.append(position)
+            stops.append(frame.Stop.id)
+            runs.append(run)
+            events.append(event)
+
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype="U1")
+        self.runs = np.asarray(runs, dtype=np.int64)
+        self.events = np.asarray(events, dtype=np.int64)
+
+    def Select(self, stops):
+        # Boolean mask of the frames with one of the given stops
+        return np.isin(self.stops, [stop.id for stop in stops])
+
+    def Find(self, stops, event=None, skip=0):
+        """
+        Returns the position of the frame to start from and how many frames of
+        the given stops were skipped before it. The position is None if the
+        requested frame is not in this file.
+        """
+        viewable = self.positions[self.Select(stops)]
+        if event is not None:
+            run_id, event_id = event
+            selected = (
+                self.Select(stops) & (self.runs == run_id) & (self.events == event_id)
+            )
+            if not selected.any():
+                return None, len(viewable)
+            position = self.positions[selected][0]
+            return position, int(np.count_nonzero(viewable < position))
+        if skip >= len(viewable):
+            return None, len(viewable)
+        return viewable[skip], skip
+
+    def GeometryPositions(self, before=None):
+        positions = self.positions[self.stops == icetray.I3Frame.Geometry.id]
+        if before is not None:
+            positions = positions[positions < before]
+        return positions
+
+
+class FrameReader(object):
+    """
+    I3 files kept open (at most maxFiles) to read single frames by position.
+    A frame after the last one read only skips the frames in between,
+    a frame before it reopens the file.
+    """
+
+    def __init__(self, maxFiles=4):
+        self.maxFiles = maxFiles
+        self.files = OrderedDict()  # path: (I3File, position of its next frame)
+        self.lock = threading.Lock()
+
+    def Read(self, path, position):
+        position = int(position)
+        with self.lock:
+            i3file, current = self.files.pop(path, (None, 0))
+            if i3file is None or position < current:
+                if i3file is not None:
+                    i3file.close()
+                i3file, current = dataio.I3File(path), 0
+            if position > current:
+                i3file.seek(position)
+            frame = i3file.pop_frame()
+            self.files[path] = (i3file, position + 1)
+            while len(self.files) > self.maxFiles:
+                self.files.popitem(last=False)[1][0].close()
+        return frame
+
+
+_reader = FrameReader()
+
+
+def ReadFrameAt(path, position):
+    return _reader.Read(path, position)
+
+
+def IterFrames(files, stops, event=None, skip=0):
+    """
+    Yields (path, position, frame) for the frames of all the files.
+    If an event (run_id, event_id) or a number of frames to skip is given, the files are indexed
+    and the reading starts directly at the requested frame. Geometry frames before it are still yielded.
+    """
+    searching = event is not None or skip > 0
+    for path in files:
+        if not searching:
+            for position, frame in enumerate(dataio.I3File(path)):
+                yield path, position, frame
+            continue
+
+        # The geometry frames and the start frame are read with one pass over the file
+        index = FrameIndex.Open(path)
+        start, skipped = index.Find(stops, event, skip)
+        skip -= skipped
+        i3file = dataio.I3File(path)
+        for position in index.GeometryPositions(before=start):
+            i3file.seek(int(position))
+            yield path, int(position), i3file.pop_frame()
+        if start is None:
+            i3file.close()
+            continue
+
+        searching = False
+        i3file.seek(int(start))
+        for position, frame in enumerate(i3file, start=int(start)):
+            yield path, position, frame
+
+    if searching:
+        print("WARNING: the requested frame was not found in the input files")
@@ -0,0 +1,90 @@
+"""
+Cache of the detector geometries extracted from the GCD files.
+The positions of all the detector types are stored in a compressed .npz file named after
+the path, size and modification time of the file holding the geometry frame (and the
+position of the frame in it), so that later runs with the same GCD load the arrays instead
+of looping over the I3Geometry. The file itself is not read, which matters when the
+geometry frame sits at the start of a large data file.
+"""
+
+import os
+import hashlib
+
+import numpy as np
+
+
+def DefaultCacheDir():
+    base = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(base, "event_viewer", "geometry")
+
+
+class GeometryCache(object):
+    """Geometry arrays of each detector name, keyed by the hash of the GCD content"""
+
+    version = 2
+
+    def __init__(self, directory=None):
+        self.directory = directory or DefaultCacheDir()
+
+    def __FileKey(self, path):
+        # A file replaced or modified in place gets a new key
+        stat = os.stat(path)
+        key = "{}|{}|{}".format(os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def CachePath(self, path, position):
+        return os.path.join(
+            self.directory,
+            "{}_{}_v{}.npz".format(self.__FileKey(path), position, self.version),
+        )
+
+    def Load(self, path, position):
+        # Returns {detector name: (keys, positions)} or None if this geometry is not cached yet
+        cachePath = self.CachePath(path, position)
+        if not os.path.exists(cachePath):
+            return None
+        geometry = {}
+        try:
+            with np.load(cachePath) as data:
+                for name in data["names"]:
+                    geometry[str(name)] = (
+                        data[name + "_keys"],
+                        data[name + "_positions"],
+                    )
+        except (OSError, KeyError, ValueError):
+            return None
+        return geometry
+
+    def Save(self, path, position, detectors):
+        arrays = {"names": np.asarray([det.name for det in detectors])}
+        for det in detectors:
+            keys, positions = det.GetGeometryArrays()
+            arrays[det.name + "_keys"] = keys
+            arrays[det.name + "_positions"] = positions
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            np.savez_compressed(self.CachePath(path, position), **arrays)
+        except OSError:
+            print(
+                "WARNING: Could not write the geometry cache in {}".format(
+                    self.directory
+                )
+            )
+
+
+def ExtractGeometry(detectors, frame, path, position, cache=None):
+    """
+    Returns {detector name: (keys, positions)} for the geometry frame found at the given
+    position of the file. It is loaded from the cache if possible, otherwise each detector
+    extracts it from the frame and the result is saved in the cache.
+    """
+    geometry = cache.Load(path, position) if cache is not None else None
+    if geometry is None or any(det.name not in geometry for det in detectors):
+        for det in detectors:
+            det.ExtractFromGFrame(frame)
+        geometry = {det.name: det.GetGeometryArrays() for det in detectors}
+        if cache is not None:
+            cache.Save(path, position, detectors)
+    return geometry
@@ -1,5 +1,8 @@
 import numpy as np
 from icecube.dataclasses import I3Constants
+from icecube.icetray import I3Units
+from .FrameCatalog import FrameCatalog
+from .ShowerGeometry import AxisDirections, AxialRadii, PlaneTimes, ProjectCores
 
 def get_radius(particle, pos):
     # Particle is the primary particle and pos is the detector position
@@ -24,3 +27,79 @@ def get_radius(particle, pos):
 def ProjectToObslev(point, direction, obslev=(I3Constants.SurfaceElev - I3Constants.OriginElev)):
     # Simple geometric projection of a point to a given z value (obslev)
     return point + direction * (point.z - obslev) / np.cos(direction.zenith)
+
+
+# Vectorized versions of the functions above.
+# positions is an (N, 3) array and particles is either one I3Particle or a list of them:
+# the results have shape (N,) for one particle and (P, N) for P particles.
+
+
+def ParticleArrays(particles):
+    # Core positions (P, 3), unit directions (P, 3) and core times (P,) of the particles.
+    # The z component of the direction follows get_radius: -sqrt(1 - nx^2 - ny^2)
+    particles = [particles] if not isinstance(particles, (list, tuple)) else particles
+    cores = np.asarray([(p.pos.x, p.pos.y, p.pos.z) for p in particles], dtype=float).reshape(-1, 3)
+    dirs = AxisDirections([p.dir.x for p in particles], [p.dir.y for p in particles])
+    times = np.asarray([p.time for p in particles], dtype=float)
+    return cores, dirs, times
+
+
+def _squeeze(particles, values):
+    return values[0] if not isinstance(particles, (list, tuple)) else values
+
+
+def get_radii(particles, positions):
+    # Axial radius of each position w.r.t. the shower axis of each particle
+    cores, dirs, _ = ParticleArrays(particles)
+    return _squeeze(particles, AxialRadii(cores, dirs, positions))
+
+
+def get_plane_times(particles, positions):
+    # Arrival time of the plane shower front of each particle at each position
+    # (the former inline loops of IceTop and Scintillator took dir.y as the z component of the direction)
+    cores, dirs, times = ParticleArrays(particles)
+    return _squeeze(particles, PlaneTimes(cores, dirs, times, positions, I3Constants.c))
+
+
+def get_plane_delays(particles, positions, times):
+    # Time (ns) of the plane front minus the measured time at each position
+    return (get_plane_times(particles, positions) - np.asarray(times)) / I3Units.ns
+
+
+def ProjectToObslevArray(particles, obslev=(I3Constants.SurfaceElev - I3Constants.OriginElev)):
+    # Core of each particle projected along its direction to the obslev, shape (3,) or (P, 3)
+    many = particles if isinstance(particles, (list, tuple)) else [particles]
+    cores = np.asarray([(p.pos.x, p.pos.y, p.pos.z) for p in many], dtype=float).reshape(-1, 3)
+    dirs = np.asarray([(p.dir.x, p.dir.y, p.dir.z) for p in many], dtype=float).reshape(-1, 3)
+    cosZen = np.cos([p.dir.zenith for p in many])
+    return _squeeze(particles, ProjectCores(cores, dirs, cosZen, obslev))
+
+
+def GetI3Geometries(frame):
+    # The I3Geometry objects of a geometry frame, the other keys are not deserialized
+    return [frame[key] for key in FrameCatalog.Of(frame).KeysOfType("I3Geometry")]
+
+
+def StringSegments(strings, positions, maxGap=100.0, maxOffset=5.0):
+    # Groups the DOMs of each string into vertical runs and returns (segments (S, 2, 3), lone DOM rows).
+    # A run is broken when consecutive DOMs are more than maxGap apart in z or maxOffset apart in x-y,
+    # e.g. the IceTop DOMs of a string are not joined to its in-ice DOMs.
+    # Runs of a single position (a single DOM, or the two DOMs of an IceTop tank) would be
+    # zero-length segments, which are not drawn: they are returned as lone rows instead.
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    strings = np.asarray(strings)
+    if not len(strings):
+        return np.zeros((0, 2, 3)), np.zeros(0, dtype=np.intp)
+    order = np.lexsort((positions[:, 2], strings))
+    ordered = positions[order]
+    step = np.diff(ordered, axis=0)
+    breaks = (
+        (strings[order][1:] != strings[order][:-1])
+        | (np.abs(step[:, 2]) > maxGap)
+        | (np.hypot(step[:, 0], step[:, 1]) > maxOffset)
+    )
+    first = np.r_[0, np.flatnonzero(breaks) + 1]
+    last = np.r_[np.flatnonzero(breaks), len(order) - 1]
+    runs = np.any(ordered[first] != ordered[last], axis=1)
+    segments = np.stack([ordered[first[runs]], ordered[last[runs]]], axis=1)
+    return segments, order[first[~runs]]
@@ -1,6 +1,11 @@
-from .Detector import Detector, PulseData
+from .Detector import Detector, PulseSeries, ParticleKey
+from .EventCache import LRUCache
+from .FrameCatalog import FrameCatalog
+from .PulseResolver import PulseResolver
 
-from .GeometryTools import get_radius
+from .GeometryTools import get_radii, GetI3Geometries
+from .Markers import DataMarkerCollection, SetScatter3d
+from .Laputop import LaputopCurves, RadiusSpace
 
 import numpy as np
 
@@ -9,7 +14,7 @@ from icecube.icetray import I3Units
 from icecube.dataclasses import I3Constants, I3RecoPulseSeriesMap
 
 from matplotlib.collections import PatchCollection
-from matplotlib.patches import Circle
+from matplotlib.path import Path
 from matplotlib import colors, cm
 
 from icecube.recclasses import I3LaputopParams
@@ -30,6 +35,11 @@ class IceTop(Detector):
         self.minPatchSize = 5
         self.maxPatchSize = self.minPatchSize * 5
         self.time_delay = []
+        self.paramsKey = "LaputopParams"
+        self.laputopParams = None
+        self.eventID = None
+        # Laputop curves of the last events, keyed by (event, params key, reference particle)
+        self.laputopCache = LRUCache(1024 * 1024)
         self.tanks_position_patches = PatchCollection([])
         self.tanks_pulse_patches = PatchCollection([])
 
@@ -42,82 +52,53 @@ class IceTop(Detector):
     def ExtractFromGFrame(self, frame):
         assert frame.Stop == icetray.I3Frame.Geometry
 
-        self.positions.clear()
-
-        # Check all things in geometry frame I3Geometry
-        for key in frame.keys():
-            if key == "I3GeometryDiff":
-                continue
-            i3geometry = frame[key]
+        keys = []
+        positions = []
+        for i3geometry in GetI3Geometries(frame):
             for stnkey, station in i3geometry.stationgeo:
                 for tank in station:
                     for omkey in tank.omkey_list:
                         pos = tank.position
-                        self.positions[str(omkey)] = np.asarray((pos.x, pos.y, pos.z))
+                        keys.append(self.GeometryKey(omkey))
+                        positions.append((pos.x, pos.y, pos.z))
+        self.SetGeometry(keys, positions)
 
-    def DrawGeometry(self, ax):
-        if not self.shouldDraw:
-            return
+    def GeometryKey(self, key):
+        return (key.string, key.om, key.pmt)
 
-        tanks_patches = []
-        for pos in self.positions.values():
-            tanks_patches.append(
-                Circle(
-                    pos,
-                    self.minPatchSize,
-                    edgecolor="None",
-                    facecolor=self.color,
-                    alpha=0.5,
-                )
-            )
-        self.tanks_position_patches = PatchCollection(
-            tanks_patches, match_original=True
+    def DrawGeometry(self, ax):
+        # Drawn once for each geometry frame, the hits of each Q/P frame are updated by DrawHits
+        self.tanks_position_patches = DataMarkerCollection(
+            ax,
+            Path.unit_circle(),
+            offsets=self.geometry.positions,
+            sizes=self.minPatchSize,
+            edgecolor="None",
+            facecolor=self.color,
+            alpha=0.5,
         )
-        ax.add_collection(self.tanks_position_patches)
-
-        amps = []
-        positions = []
-        time = []
-        pulses_patches = []
+        ax.add_collection(self.tanks_position_patches, autolim=False)
 
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-            for omkey in pulses.keys():
-                pulse = pulses[omkey]
-                pos = self.positions[str(omkey)]
-                totalCharge = sum([p.charge for p in pulse])
+        self.tanks_pulse_patches = DataMarkerCollection(
+            ax, Path.unit_circle(), edgecolor="None", alpha=0.2
+        )
+        ax.add_collection(self.tanks_pulse_patches, autolim=False)
 
-                positions.append(pos)
-                amps.append(totalCharge)
-                time.append(pulse[0].t)
+        self.tanks_position_patches.set_visible(self.shouldDraw)
+        self.tanks_pulse_patches.set_visible(self.shouldDraw)
 
-        if not len(amps):
-            return
+    def DrawHits(self, ax):
+        hits = self.allHits
+        relPatchSize = hits.ScaledSizes(self.minPatchSize * 1.2, self.maxPatchSize)
 
-        amps = np.log10(amps)
-        minAmp = min(amps)
-        maxAmp = max(amps)
-
-        relPatchSize = self.minPatchSize * 1.2 + (
-            self.maxPatchSize - self.minPatchSize * 1.2
-        ) * (amps - minAmp) / (maxAmp - minAmp + 0.01)
-
-        # The color map is used for  showing the time delay of the pulses.
-        # The time is set to 0 by subtracting the min and then it is normalized by dividing the max
-        cmap = cm.get_cmap(self.colorMapType)
-        time = np.subtract(time, min(time))
-        time = np.divide(time, max(time))
-        time = cmap(time)
-        for size, pos, t in zip(relPatchSize, positions, time):
-            pulses_patches.append(
-                Circle(pos, size, edgecolor="None", facecolor=t, alpha=0.2)
-            )
-        self.tanks_pulse_patches = PatchCollection(pulses_patches, match_original=True)
-        ax.add_collection(self.tanks_pulse_patches)
+        # The color map is used for showing the time delay of the pulses
+        self.tanks_pulse_patches.set_offsets(hits.positions)
+        self.tanks_pulse_patches.set_sizes(relPatchSize)
+        self.tanks_pulse_patches.set_facecolor(hits.colors)
 
     def Draw3dGeometry(self, ax):
         # if not self.shouldDraw: return
-        x, y, z = zip(*self.positions.values())
+        x, y, z = self.geometry.positions.T
         ax.scatter(
             x,
             y,
@@ -129,153 +110,106 @@ class IceTop(Detector):
             alpha=0.5,
         )
 
-        amps = []
-        positions = []
-        time = []
-        pulses_patches = []
-
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-            for omkey in pulses.keys():
-                pulse = pulses[omkey]
-                pos = self.positions[str(omkey)]
-                totalCharge = sum([p.charge for p in pulse])
+        self.tanks_pulse_points = ax.scatter(
+            [], [], [], marker="o", edgecolor="None", alpha=0.4
+        )
 
-                positions.append(pos)
-                amps.append(totalCharge)
-                time.append(pulse[0].t)
+    def Draw3dHits(self, ax):
+        hits = self.allHits
+        relPatchSize = hits.ScaledSizes(self.minPatchSize * 20.0, self.maxPatchSize)
 
-        if not len(amps):
-            return
+        # The color map is used for showing the time delay of the pulses
+        SetScatter3d(self.tanks_pulse_points, hits.positions, relPatchSize, hits.colors)
 
-        amps = np.log10(amps)
-        minAmp = min(amps)
-        maxAmp = max(amps)
-
-        relPatchSize = self.minPatchSize * 20.0 + (
-            self.maxPatchSize - self.minPatchSize * 20.0
-        ) * (amps - minAmp) / (maxAmp - minAmp + 0.01)
-
-        # The color map is used for  showing the time delay of the pulses.
-        # The time is set to 0 by subtracting the min and then it is normalized by dividing the max
-        cmap = cm.get_cmap(self.colorMapType)
-        time = np.subtract(time, min(time))
-        time = np.divide(time, max(time))
-        time = cmap(time)
-        x, y, z = zip(*positions)
-        ax.scatter(
-            x,
-            y,
-            z,
-            marker="o",
-            s=relPatchSize,
-            edgecolor="None",
-            facecolor=time,
-            alpha=0.4,
-        )
-
-    def ExtractFromQPFrame(self, frame):
-        self.measuredData.clear()
-        self.laputopParams = None
+    def ExtractMeasuredData(self, frame):
+        measuredData = {}
+        resolver = PulseResolver.Of(frame)
         for framekey in self.pulsekeys:
-            if framekey in frame.keys():
-                # gets Tank Pulses and stores them in a dict with the detector key for the unique geometry match
-                try:
-                    try:
-                        recopulse_map = frame[framekey]
-                        _ = len(recopulse_map)
-                    except:
-                        recopulse_map = frame[framekey].apply(frame)
-                        _ = len(recopulse_map)
-                except:
-                    Warning(f"Could not extract pulses {framekey} from frame")
+            if framekey in resolver.catalog:
+                # gets Tank Pulses (masks are applied to their source once per frame) for the unique geometry match
+                pulses = resolver.Resolve(framekey)
+                if pulses is None:
+                    print(f"WARNING: Could not extract pulses {framekey} from frame")
                     continue
 
-                if not len(recopulse_map):
+                if not len(pulses):
                     continue
-                pulses = {}
-                for omkey in recopulse_map.keys():
-                    pulses_per_tank = []
-                    for pulse in recopulse_map[omkey]:
-                        pulses_per_tank.append(
-                            PulseData(pulse.time, pulse.charge, True)
-                        )
-                    pulses[omkey] = pulses_per_tank
-                self.measuredData[framekey] = pulses
-
-        if "LaputopParams" in frame.keys():
-            self.laputopParams = I3LaputopParams.from_frame(frame, "LaputopParams")
-
-    def __DrawLaputopLDF(self, ax, radii):
-        lg_s125 = self.laputopParams.value(LaputopParameter.Log10_S125)
-        lg_s125_err = self.laputopParams.error(LaputopParameter.Log10_S125)
-        s125 = 10**lg_s125
-        beta = self.laputopParams.value(LaputopParameter.Beta)
-        beta_err = self.laputopParams.error(LaputopParameter.Beta)
-
-        rmin = np.amin(radii, axis=0)
-        rmax = np.amax(radii, axis=0)
-        rspace = 10 ** np.linspace(np.log10(rmin * 0.9), np.log10(rmax * 1.1), 50)
-        ldfVals = np.vectorize(self.laputopParams.expected_signal)(rspace)
-        ldfErr = np.vectorize(self.laputopParams.expected_signal_error)(rspace)
-        curveVals = np.vectorize(self.laputopParams.expected_shower_front_delay)(rspace)
-        curveErr = np.vectorize(self.laputopParams.expected_shower_front_delay_error)(
-            rspace
-        )
+                measuredData[framekey] = pulses
+        return measuredData
+
+    def ExtractFromQPFrame(self, frame, measuredData=None):
+        super(IceTop, self).ExtractFromQPFrame(frame, measuredData)
+        self.laputopParams = None
+        self.eventID = None
+
+        catalog = FrameCatalog.Of(frame)
+        if self.paramsKey in catalog:
+            self.laputopParams = I3LaputopParams.from_frame(frame, self.paramsKey)
+        if "I3EventHeader" in catalog:
+            header = frame["I3EventHeader"]
+            self.eventID = (
+                header.run_id,
+                header.event_id,
+                header.sub_event_id,
+                frame.Stop.id,
+            )
 
-        ax.plot(rspace, ldfVals, color=self.color)
+    def __LaputopCurves(self, particle):
+        # Curves over the radii of all the hits, computed once per event, params key, reference particle
+        # and radius range (the hits depend on the pulse keys drawn)
+        hits = self.allHits
+        if not self.laputopParams or not len(hits):
+            return None
+        hits.SetParticle(particle)
+        key = None
+        if self.eventID is not None:
+            radiusRange = (float(hits.radius.min()), float(hits.radius.max()))
+            key = (self.eventID, self.paramsKey, ParticleKey(particle), radiusRange)
+            curves = self.laputopCache.Get(key)
+            if curves is not None:
+                return curves
+
+        curves = LaputopCurves(self.laputopParams, RadiusSpace(hits.radius))
+        if key is not None:
+            self.laputopCache.Put(key, curves)
+        return curves
+
+    def __DrawLaputopLDF(self, ax, curves):
+        ax.plot(curves.radii, curves.signal, color=self.color)
         ax.fill_between(
-            rspace, ldfVals + ldfErr, ldfVals - ldfErr, color=self.color, alpha=0.2
+            curves.radii,
+            curves.signal + curves.signalError,
+            curves.signal - curves.signalError,
+            color=self.color,
+            alpha=0.2,
         )
-        ax.scatter(125, s125, marker="X", color=self.color)
+        ax.scatter(125, curves.s125, marker="X", color=self.color)
 
     def DrawLDF(self, ax, particle):
         if not self.shouldDraw:
             return
 
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-
-            radii = []
-            amps = []
-            time = []
-
-            for omkey in pulses.keys():
-                pulse = pulses[omkey]
-                pos = self.positions[str(omkey)]
-                r = get_radius(particle, pos)
-
-                radii.append(r)
-                amps.append(sum([p.charge for p in pulse]))
-                time.append(pulse[0].t)
-
-            cmap = cm.get_cmap(self.colorMapType)
-            time = np.subtract(time, min(time))
-            time = np.divide(time, max(time))
-            time = cmap(time)
+        for ikey, framekey in enumerate(self.hits.keys()):
+            hits = self.hits[framekey]
+            hits.SetParticle(particle)
+            radii = hits.radius
             ax.scatter(
                 radii,
-                amps,
-                c=time,
+                hits.charge,
+                c=hits.colors,
                 alpha=0.4,
                 marker=self.shapes[ikey % len(self.shapes)],
                 label=framekey,
             )
 
-            if self.laputopParams:
-                self.__DrawLaputopLDF(ax, radii)
+        curves = self.__LaputopCurves(particle)
+        if curves is not None:
+            self.__DrawLaputopLDF(ax, curves)
 
-        # Silent stations: pulsesKeys need to be rewritten to be compatible with geometry keys
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-            radii = []
-            pulsesKeys = [str(omkey) for omkey in pulses.keys()]
-
-            for omkey in [el for el in self.positions.keys() if el not in pulsesKeys]:
-                pos = self.positions[omkey]
-                r = get_radius(particle, pos)
-                radii.append(r)
-            amps = [0.01 for i in range(len(radii))]
+        # Silent stations: geometry rows without pulses, masked once per frame
+        for ikey, framekey in enumerate(self.silent.keys()):
+            radii = get_radii(particle, self.geometry.positions[self.silent[framekey]])
+            amps = np.full(len(radii), 0.01)
             ax.scatter(
                 radii,
                 amps,
@@ -289,69 +223,30 @@ class IceTop(Detector):
         if not self.shouldDraw:
             return
 
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-
-            radii = []
-            amps = []
-            time = []
-
-            tCore = particle.time
-            core = np.array([particle.pos[i] for i in range(3)])
-            nDir = np.array([particle.dir.x, particle.dir.y, particle.dir.y])
-
-            for omkey in pulses.keys():
-                pulse = pulses[omkey]
-                pos = self.positions[str(omkey)]
-                r = get_radius(particle, pos)
-                relPos = pos - core
-                delay = (
-                    tCore
-                    + (nDir[0] * relPos[0] + nDir[1] * relPos[1] - nDir[2] * relPos[2])
-                    / I3Constants.c
-                )
-                delay = (delay - pulse[0].t) / I3Units.ns
-
-                radii.append(r)
-                amps.append(delay)
-                time.append(pulse[0].t)
-
-            # Same as above
-            cmap = cm.get_cmap(self.colorMapType)
-            time = np.subtract(time, min(time))
-            time = np.divide(time, max(time))
-            time = cmap(time)
+        for ikey, framekey in enumerate(self.hits.keys()):
+            hits = self.hits[framekey]
+            hits.SetParticle(particle)
+            radii = hits.radius
             ax.scatter(
                 radii,
-                amps,
-                c=time,
+                hits.delay,
+                c=hits.colors,
                 alpha=0.4,
                 marker=self.shapes[ikey % len(self.shapes)],
             )
 
-            if self.laputopParams:
-                self.__DrawLaputopTiming(ax, radii)
+        curves = self.__LaputopCurves(particle)
+        if curves is not None:
+            self.__DrawLaputopTiming(ax, curves)
 
         # Silent stations are not needed for the time plot
 
-    def __DrawLaputopTiming(self, ax, radii):
-        rmin = np.amin(radii, axis=0)
-        rmax = np.amax(radii, axis=0)
-        rspace = 10 ** np.linspace(np.log10(rmin * 0.9), np.log10(rmax * 1.1), 50)
-        curveVals = (
-            np.vectorize(self.laputopParams.expected_shower_front_delay)(rspace)
-            / I3Units.ns
-        )
-        curveErr = (
-            np.vectorize(self.laputopParams.expected_shower_front_delay_error)(rspace)
-            / I3Units.ns
-        )
-
-        ax.plot(rspace, curveVals, color=self.color)
+    def __DrawLaputopTiming(self, ax, curves):
+        ax.plot(curves.radii, curves.delay, color=self.color)
         ax.fill_between(
-            rspace,
-            curveVals + curveErr,
-            curveVals - curveErr,
+            curves.radii,
+            curves.delay + curves.delayError,
+            curves.delay - curves.delayError,
             color=self.color,
             alpha=0.2,
         )
@@ -1,6 +1,9 @@
-from .Detector import Detector, PulseData
+from .Detector import Detector, PulseSeries
 
-from .GeometryTools import get_radius
+from .GeometryTools import get_radius, GetI3Geometries, StringSegments
+from .Markers import SetScatter3d
+from .FrameCatalog import FrameCatalog
+from .PulseResolver import PulseResolver
 
 import numpy as np
 
@@ -11,6 +14,7 @@ from icecube.dataclasses import I3Constants
 from matplotlib.collections import PatchCollection
 from matplotlib.patches import Circle
 from matplotlib import colors, cm
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
 
 from icecube.recclasses import I3LaputopParams
 from icecube.recclasses import LaputopLDF
@@ -27,11 +31,15 @@ class InIce(Detector):
         self.pulsekeys = self.GetDefaultPulseKeys()
         self.color = "k"
         self.name = "InIce"
+        self.onSurface = False
         self.minPatchSize = 5
         self.maxPatchSize = self.minPatchSize * 5
         self.time_delay = []
         self.tanks_position_patches = PatchCollection([])
+        self.tanks_lone_points = PatchCollection([])
         self.tanks_pulse_patches = PatchCollection([])
+        # Unhit DOMs drawn as string lines instead of one marker each
+        self.levelOfDetail = True
 
     def GetDefaultPulseKeys(self):
         return ["InIcePulses"]
@@ -42,26 +50,41 @@ class InIce(Detector):
     def ExtractFromGFrame(self, frame):
         assert frame.Stop == icetray.I3Frame.Geometry
 
-        self.positions.clear()
-
-        # Check all things in geometry frame I3Geometry
-        for key in frame.keys():
-            if key == "I3GeometryDiff":
-                continue
-            i3geometry = frame[key]
+        keys = []
+        positions = []
+        for i3geometry in GetI3Geometries(frame):
             for omkey, om in i3geometry.omgeo:
                 pos = om.position
-                self.positions[(omkey)] = np.asarray((pos.x, pos.y, pos.z))
+                keys.append(self.GeometryKey(omkey))
+                positions.append((pos.x, pos.y, pos.z))
+        self.SetGeometry(keys, positions)
+
+    def GeometryKey(self, key):
+        return (key.string, key.om, key.pmt)
 
     def DrawGeometry(self, ax):
         return
 
-    def Draw3dGeometry(self, ax):
-        # Get the positions of the tanks
-        # as lists of x, y, z coordinates
-        x, y, z = zip(*self.positions.values())
+    def DrawHits(self, ax):
+        return
 
-        ax.scatter(
+    def Draw3dGeometry(self, ax):
+        # Drawn once for each geometry frame. With the level of detail on, the ~5000 DOMs are
+        # drawn as one line per string (DOMs away from their string as points)
+        # and only the hit DOMs get a marker in Draw3dHits
+        if self.levelOfDetail:
+            segments, loneRows = StringSegments(
+                self.geometry.KeyArray(self.keyWidth)[:, 0], self.geometry.positions
+            )
+            self.tanks_position_patches = Line3DCollection(
+                segments, colors=self.color, linewidths=0.5, alpha=0.5
+            )
+            ax.add_collection3d(self.tanks_position_patches)
+            x, y, z = self.geometry.positions[loneRows].T
+        else:
+            x, y, z = self.geometry.positions.T
+
+        self.tanks_lone_points = ax.scatter(
             x,
             y,
             z,
@@ -71,84 +94,48 @@ class InIce(Detector):
             facecolor=self.color,
             alpha=0.5,
         )
+        if not self.levelOfDetail:
+            self.tanks_position_patches = self.tanks_lone_points
 
-        amps = []
-        positions = []
-        time = []
-        pulses_patches = []
-
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-            for omkey in pulses.keys():
-                pulse = pulses[omkey]
-                pos = self.positions[(omkey)]
-                totalCharge = sum([p.charge for p in pulse])
-
-                positions.append(pos)
-                amps.append(totalCharge)
-                time.append(pulse[0].t)
-
-        if not len(amps):
-            return
-
-        amps = np.log10(amps)
-        minAmp = min(amps)
-        maxAmp = max(amps)
-
-        relPatchSize = self.minPatchSize * 20.0 + (
-            self.maxPatchSize - self.minPatchSize * 20.0
-        ) * (amps - minAmp) / (maxAmp - minAmp + 0.01)
-
-        # The color map is used for  showing the time delay of the pulses.
-        # The time is set to 0 by subtracting the min and then it is normalized by dividing the max
-        cmap = cm.get_cmap(self.colorMapType)
-        time = np.subtract(time, min(time))
-        time = np.divide(time, max(time))
-        time = cmap(time)
-        x, y, z = zip(*positions)
-        ax.scatter(
-            x,
-            y,
-            z,
-            marker="o",
-            s=relPatchSize,
-            edgecolor="None",
-            facecolor=time,
-            alpha=0.5,
+        self.tanks_pulse_patches = ax.scatter(
+            [], [], [], marker="o", edgecolor="None", alpha=0.5
         )
 
-    def ExtractFromQPFrame(self, frame):
-        self.measuredData.clear()
-        self.laputopParams = None
+        self.tanks_position_patches.set_visible(self.shouldDraw)
+        self.tanks_lone_points.set_visible(self.shouldDraw)
+        self.tanks_pulse_patches.set_visible(self.shouldDraw)
+
+    def Draw3dHits(self, ax):
+        # Only the hit DOMs, their geometry rows are matched by OMKey in SummarizeHits
+        hits = self.allHits
+        relPatchSize = hits.ScaledSizes(self.minPatchSize * 20.0, self.maxPatchSize)
 
+        # The color map is used for showing the time delay of the pulses
+        SetScatter3d(
+            self.tanks_pulse_patches, hits.positions, relPatchSize, hits.colors
+        )
+
+    def ExtractMeasuredData(self, frame):
+        measuredData = {}
+        resolver = PulseResolver.Of(frame)
         for framekey in self.pulsekeys:
-            if framekey in frame.keys():
-                # gets Tank Pulses and stores them in a dict with the detector key for the unique geometry match
-                try:
-                    try:
-                        recopulse_map = frame[framekey]
-                        _ = len(recopulse_map)
-                    except:
-                        recopulse_map = frame[framekey].apply(frame)
-                        _ = len(recopulse_map)
-                except:
-                    Warning(f"Could not extract pulses {framekey} from frame")
+            if framekey in resolver.catalog:
+                # gets Tank Pulses (masks are applied to their source once per frame) for the unique geometry match
+                pulses = resolver.Resolve(framekey)
+                if pulses is None:
+                    print(f"WARNING: Could not extract pulses {framekey} from frame")
                     continue
 
-                if not len(recopulse_map):
+                if not len(pulses):
                     continue
-                pulses = {}
-                for omkey in recopulse_map.keys():
-                    pulses_per_tank = []
-                    for pulse in recopulse_map[omkey]:
-                        pulses_per_tank.append(
-                            PulseData(pulse.time, pulse.charge, True)
-                        )
-
-                    pulses[omkey] = pulses_per_tank
-                self.measuredData[framekey] = pulses
-
-        if "LaputopParams" in frame.keys():
+                measuredData[framekey] = pulses
+        return measuredData
+
+    def ExtractFromQPFrame(self, frame, measuredData=None):
+        super(InIce, self).ExtractFromQPFrame(frame, measuredData)
+        self.laputopParams = None
+
+        if "LaputopParams" in FrameCatalog.Of(frame):
             self.laputopParams = I3LaputopParams.from_frame(frame, "LaputopParams")
 
     def DrawLDF(self, ax, particle):
@@ -172,4 +159,5 @@ class InIce(Detector):
     def ToggleHidden(self):
         self.shouldDraw = not self.shouldDraw
         self.tanks_position_patches.set_visible(self.shouldDraw)
+        self.tanks_lone_points.set_visible(self.shouldDraw)
         self.tanks_pulse_patches.set_visible(self.shouldDraw)
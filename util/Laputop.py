@@ -0,0 +1,128 @@
+"""
+Vectorized evaluation of the Laputop LDF and shower front curves.
+The I3LaputopParams methods take one radius per call (one C++ round trip per point),
+here all the curves are computed for an array of radii at once with the closed forms
+of the DLP function and of the Gauss-parabola front delay (and of their errors).
+Each closed form is checked against the bindings at two radii and the bindings are
+used instead if it does not match (e.g. for other LDF or front delay types).
+"""
+
+import numpy as np
+
+from icecube.icetray import I3Units
+from icecube.recclasses import LaputopParameter
+
+KAPPA = 0.30264  # Curvature of the double logarithmic parabola (DLP)
+R_REF = 125.0 * I3Units.m  # Reference radius of S125
+CHECK_RADII = np.array([60.0, 400.0]) * I3Units.m
+
+
+def RadiusSpace(radii, n=50):
+    # Log-spaced radii covering the given ones, used to draw the curves
+    rmin = np.amin(radii, axis=0)
+    rmax = np.amax(radii, axis=0)
+    return 10 ** np.linspace(np.log10(rmin * 0.9), np.log10(rmax * 1.1), n)
+
+
+def _Vectorized(function, radii):
+    return np.array([function(r) for r in radii], dtype=float)
+
+
+def _Checked(closedForm, function, radii):
+    # The closed form is used when it gives the values of the bindings, otherwise the bindings are called
+    try:
+        if np.allclose(
+            closedForm(CHECK_RADII), _Vectorized(function, CHECK_RADII), rtol=1e-6
+        ):
+            return closedForm(radii)
+    except (AttributeError, ArithmeticError, TypeError, ValueError, RuntimeError):
+        pass
+    return _Vectorized(function, radii)
+
+
+def _Covariance(params, p1, p2):
+    try:
+        return params.covariance(p1, p2)
+    except AttributeError:
+        return 0.0
+
+
+def DLPSignal(params, radii):
+    x = np.log10(radii / R_REF)
+    lgS125 = params.value(LaputopParameter.Log10_S125)
+    beta = params.value(LaputopParameter.Beta)
+    return 10 ** (lgS125 - beta * x - KAPPA * x**2)
+
+
+def DLPSignalError(params, radii):
+    # Error of log10(S) propagated from the errors and covariance of Log10_S125 and Beta
+    x = np.log10(radii / R_REF)
+    lgS125Err = params.error(LaputopParameter.Log10_S125)
+    betaErr = params.error(LaputopParameter.Beta)
+    cov = _Covariance(params, LaputopParameter.Log10_S125, LaputopParameter.Beta)
+    lgErr = np.sqrt(np.clip(lgS125Err**2 + (x * betaErr) ** 2 - 2 * x * cov, 0.0, None))
+    return DLPSignal(params, radii) * np.log(10) * lgErr
+
+
+def GaussParabDelay(params, radii):
+    a = params.value(LaputopParameter.CurvParabA)
+    b = params.value(LaputopParameter.CurvGaussB)
+    sigma = params.value(LaputopParameter.CurvGaussSigma)
+    return a * radii**2 + b * (np.exp(-(radii**2) / (2 * sigma**2)) - 1)
+
+
+def GaussParabDelayError(params, radii):
+    # Error of the front delay propagated from the errors and covariances of the curvature parameters
+    b = params.value(LaputopParameter.CurvGaussB)
+    sigma = params.value(LaputopParameter.CurvGaussSigma)
+    gauss = np.exp(-(radii**2) / (2 * sigma**2))
+    gradient = {
+        LaputopParameter.CurvParabA: radii**2,
+        LaputopParameter.CurvGaussB: gauss - 1,
+        LaputopParameter.CurvGaussSigma: b * radii**2 / sigma**3 * gauss,
+    }
+    variance = np.zeros_like(radii)
+    for p1, d1 in gradient.items():
+        for p2, d2 in gradient.items():
+            if p1 == p2:
+                variance += d1**2 * params.error(p1) ** 2
+            else:
+                variance += d1 * d2 * _Covariance(params, p1, p2)
+    return np.sqrt(np.clip(variance, 0.0, None))
+
+
+class LaputopCurves(object):
+    """
+    LDF (signal and error) and front delay (delay and error, in ns) of an I3LaputopParams
+    for an array of radii, all computed once when it is built.
+    """
+
+    __slots__ = ("radii", "s125", "signal", "signalError", "delay", "delayError")
+
+    def __init__(self, params, radii):
+        self.radii = np.asarray(radii, dtype=float)
+        self.s125 = 10 ** params.value(LaputopParameter.Log10_S125)
+        self.signal = _Checked(
+            lambda r: DLPSignal(params, r), params.expected_signal, self.radii
+        )
+        self.signalError = _Checked(
+            lambda r: DLPSignalError(params, r),
+            params.expected_signal_error,
+            self.radii,
+        )
+        self.delay = (
+            _Checked(
+                lambda r: GaussParabDelay(params, r),
+                params.expected_shower_front_delay,
+                self.radii,
+            )
+            / I3Units.ns
+        )
+        self.delayError = (
+            _Checked(
+                lambda r: GaussParabDelayError(params, r),
+                params.expected_shower_front_delay_error,
+                self.radii,
+            )
+            / I3Units.ns
+        )
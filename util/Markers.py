@@ -0,0 +1,64 @@
+"""
+Collection of markers sharing one path, placed at offsets in data coordinates and scaled in data units.
+It behaves like a PatchCollection of Circles/Rectangles (a 5 m tank stays 5 m when zooming)
+but the markers are moved, resized and recolored in place with set_offsets, set_sizes and
+set_facecolor instead of building new patches for each frame.
+"""
+
+import numpy as np
+
+from matplotlib import transforms
+from matplotlib.collections import Collection
+
+
+class DataMarkerCollection(Collection):
+    """
+    path is drawn scaled by sizes[i] (in data units) at offsets[i] (in data coordinates):
+    a unit circle gives circles of radius sizes[i], Path.unit_rectangle() squares
+    of side sizes[i] with the lower left corner at offsets[i].
+    A single size is used for all the markers.
+    """
+
+    def __init__(self, ax, path, offsets=None, sizes=None, **kwargs):
+        super(DataMarkerCollection, self).__init__(**kwargs)
+        self._paths = [path]
+        if hasattr(self, "set_offset_transform"):
+            self.set_offset_transform(ax.transData)
+        else:
+            self._transOffset = ax.transData
+        self.set_offsets(np.zeros((0, 2)) if offsets is None else offsets)
+        self.set_sizes(sizes)
+
+    def set_offsets(self, offsets):
+        offsets = np.asarray(offsets, dtype=float)
+        # Only x and y are used, the positions can be given as (N, 3) arrays
+        super(DataMarkerCollection, self).set_offsets(
+            offsets.reshape(-1, offsets.shape[-1])[:, :2]
+        )
+
+    def set_sizes(self, sizes, dpi=72.0):
+        # The sizes are in data units, the dpi is not used
+        self._sizes = (
+            np.zeros(0) if sizes is None else np.asarray(sizes, dtype=float).ravel()
+        )
+        self._transforms = np.zeros((len(self._sizes), 3, 3))
+        self._transforms[:, 0, 0] = self._sizes
+        self._transforms[:, 1, 1] = self._sizes
+        self._transforms[:, 2, 2] = 1.0
+        self.stale = True
+
+    def draw(self, renderer):
+        # Linear part of the data to display transform, the offsets carry the translation
+        matrix = self.axes.transData.get_affine().get_matrix().copy()
+        matrix[:2, 2:] = 0
+        self.set_transform(transforms.Affine2D(matrix))
+        super(DataMarkerCollection, self).draw(renderer)
+
+
+def SetScatter3d(collection, positions, sizes, colors):
+    # Moves, resizes and recolors in place the points of a 3D scatter (Path3DCollection)
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    collection._offsets3d = (positions[:, 0], positions[:, 1], positions[:, 2])
+    collection.set_sizes(sizes)
+    collection.set_facecolor(colors)
+    collection.stale = True
@@ -0,0 +1,141 @@
+"""
+Reads the input frames ahead of the viewer in a worker thread.
+While the user looks at the current event, the next frames are read, decompressed
+and the detector data is extracted, so that pressing return shows an already prepared event.
+The number of frames and the memory held by the queue are bounded.
+"""
+
+import queue
+import threading
+
+from icecube import icetray
+
+
+def FrameSizeBytes(frame):
+    # Size of the serialized buffers of the frame, used as an estimate of the memory it holds
+    try:
+        return sum(frame.size(key) for key in frame.keys())
+    except Exception:
+        return 0
+
+
+class PreparedFrame(object):
+    __slots__ = ("path", "position", "frame", "measuredData", "generation", "nbytes")
+
+    def __init__(self, path, position, frame):
+        self.path = path
+        self.position = position
+        self.frame = frame
+        self.measuredData = None
+        self.generation = -1
+        self.nbytes = 0
+
+
+class FramePrefetcher(object):
+    """
+    Wraps an iterator of (path, position, frame) and yields PreparedFrame objects.
+    With depth=0 no thread is started and the frames are read on demand.
+    Call Invalidate() whenever the keys of the detectors or the frames to view change:
+    the data extracted with the old settings is then dropped and extracted again when shown.
+    """
+
+    def __init__(self, frames, detectors, framesToView, depth=4, maxMB=1024):
+        self.frames = frames
+        self.detectors = detectors
+        self.framesToView = list(framesToView)
+        self.depth = depth
+        self.maxBytes = maxMB * 1024 * 1024
+        self.generation = 0
+        self.queuedBytes = 0
+        self.error = None
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.queue = queue.Queue(maxsize=max(depth, 1))
+        self.thread = None
+        if self.depth > 0:
+            self.thread = threading.Thread(target=self.__Worker, daemon=True)
+            self.thread.start()
+
+    def Invalidate(self, framesToView=None):
+        if framesToView is not None:
+            self.framesToView = list(framesToView)
+        self.generation += 1
+
+    def Stop(self):
+        # Called when the viewer quits: the worker stops reading after the frame in hand
+        self.stopped = True
+        with self.condition:
+            self.condition.notify_all()
+        # Frees the queue in case the worker is blocked putting a frame into it
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def __Prepare(self, path, position, frame):
+        item = PreparedFrame(path, position, frame)
+        if frame.Stop in self.framesToView:
+            item.generation = self.generation
+            item.measuredData = {
+                det.name: det.ExtractMeasuredData(frame) for det in self.detectors
+            }
+        return item
+
+    def __Worker(self):
+        try:
+            for path, position, frame in self.frames:
+                if self.stopped:
+                    break
+                # Only Q and P frames can be selected for viewing, the rest is not queued
+                if frame.Stop not in [
+                    icetray.I3Frame.Geometry,
+                    icetray.I3Frame.DAQ,
+                    icetray.I3Frame.Physics,
+                ]:
+                    continue
+                item = self.__Prepare(path, position, frame)
+                item.nbytes = FrameSizeBytes(frame)
+                with self.condition:
+                    # A frame larger than the whole budget is still let through when the queue is empty
+                    while (
+                        not self.stopped
+                        and self.queuedBytes > 0
+                        and self.queuedBytes + item.nbytes > self.maxBytes
+                    ):
+                        self.condition.wait()
+                    if self.stopped:
+                        break
+                    self.queuedBytes += item.nbytes
+                self.queue.put(item)
+        except Exception as error:
+            self.error = error
+        finally:
+            # Nobody reads the queue any more once stopped
+            if not self.stopped:
+                self.queue.put(None)
+
+    def __Release(self, item):
+        with self.condition:
+            self.queuedBytes -= item.nbytes
+            self.condition.notify_all()
+
+    def __iter__(self):
+        if self.thread is None:
+            for path, position, frame in self.frames:
+                yield self.__Prepare(path, position, frame)
+            return
+
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            self.__Release(item)
+            if item.generation != self.generation:
+                item.measuredData = None
+            yield item
+
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,49 @@
+"""
+Resolution of the pulse keys of a frame into PulseSeries, once per frame.
+A key can hold a pulse map, or a mask (or union) of the pulses of another key, which
+is applied to the frame and converted like a map. The resolved keys are kept until the
+frame changes (e.g. a refresh of the same event resolves nothing again).
+"""
+
+from .Detector import PulseSeries
+from .FrameCatalog import FrameCatalog, FrameReference, RecentFrames
+
+
+class PulseResolver(object):
+    """PulseSeries of the pulse keys of one frame, use PulseResolver.Of(frame)"""
+
+    _recent = RecentFrames()
+
+    def __init__(self, frame):
+        self.frame = FrameReference(frame)
+        self.catalog = FrameCatalog.Of(frame)
+        self.series = {}
+
+    @classmethod
+    def Of(cls, frame):
+        return cls._recent.Get(frame, cls)
+
+    def Resolve(self, key):
+        """PulseSeries of the key, None if the key is missing or does not hold pulses"""
+        if key not in self.series:
+            self.series[key] = self.__Resolve(key)
+        return self.series[key]
+
+    def __Resolve(self, key):
+        frame = self.frame()
+        if frame is None or key not in self.catalog:
+            return None
+        try:
+            pulses = frame[key]
+        except Exception:
+            return None
+
+        try:
+            try:
+                _ = len(pulses)
+            except:
+                pulses = pulses.apply(frame)
+                _ = len(pulses)
+        except:
+            return None
+        return PulseSeries.FromPulseMap(pulses)
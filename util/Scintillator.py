@@ -1,6 +1,8 @@
-from .Detector import Detector, PulseData
+from .Detector import Detector
 
-from .GeometryTools import get_radius
+from .GeometryTools import get_radii, GetI3Geometries
+from .Markers import DataMarkerCollection, SetScatter3d
+from .PulseResolver import PulseResolver
 
 import numpy as np
 
@@ -9,7 +11,7 @@ from icecube.icetray import I3Units
 from icecube.dataclasses import I3Constants
 
 from matplotlib.collections import PatchCollection
-from matplotlib.patches import Rectangle
+from matplotlib.path import Path
 from matplotlib import colors, cm
 
 class Scintillator(Detector):
@@ -19,6 +21,7 @@ class Scintillator(Detector):
         self.pulsekeys = self.GetDefaultPulseKeys()
         self.color = "r"
         self.name = 'Scintillators'
+        self.keyWidth = 2
     
         self.minPatchSize = 10
         self.maxPatchSize = self.minPatchSize * 5
@@ -35,146 +38,82 @@ class Scintillator(Detector):
     def ExtractFromGFrame(self, frame):
         assert(frame.Stop == icetray.I3Frame.Geometry)
 
-        self.positions.clear()
-
-        #Check all things in geometry frame I3Geometry
-        for key in frame.keys():
-            if key == "I3GeometryDiff": continue
-            i3geometry = frame[key]
+        keys = []
+        positions = []
+        for i3geometry in GetI3Geometries(frame):
             for scintkey, scint in i3geometry.scintgeo:
                 pos = scint.position
-                self.positions[(scintkey.station, scintkey.panel)] = np.asarray((pos.x, pos.y, pos.z))
+                keys.append(self.GeometryKey(scintkey))
+                positions.append((pos.x, pos.y, pos.z))
+        self.SetGeometry(keys, positions)
 
 
-    def DrawGeometry(self, ax):
-        if not self.shouldDraw: return
+    def GeometryKey(self, key):
+        return (key.station, key.panel)
 
-        scint_patches = []
-        for pos in self.positions.values():
-            scint_patches.append(Rectangle(pos, self.minPatchSize, self.minPatchSize, edgecolor="None", facecolor=self.color, alpha=1.0))
-        self.scint_position_patches = PatchCollection(scint_patches, match_original=True)
-        ax.add_collection(self.scint_position_patches)
-
-        amps = []
-        positions = []
-        time = []
-        pulses_patches = []
-
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-            for scintkey in pulses.keys():
-                pulse = pulses[scintkey]
-                pos = self.positions[(scintkey.station, scintkey.panel)]
-
-                positions.append(pos)
-                amps.append(pulse.charge)
-                time.append(pulse.t)
-
-        if not len(amps): return
-
-        amps = np.log10(amps)
-        minAmp = min(amps)
-        maxAmp = max(amps)
-
-        relPatchSize = self.minPatchSize*1.2 + (self.maxPatchSize - self.minPatchSize*1.2) * (amps - minAmp) / (maxAmp - minAmp + 0.01)
-
-        # The color map is used for  showing the time delay of the pulses.
-        # The time is set to 0 by subtracting the min and then it is normalized by dividing the max
-        cmap = cm.get_cmap(self.colorMapType)
-        time = np.subtract(time, min(time))
-        time = np.divide(time, max(time))
-        time = cmap(time)
-        for size, pos, t in zip(relPatchSize, positions, time):
-            pulses_patches.append(Rectangle(pos, size/2., size/2., edgecolor="None", facecolor=t, alpha=0.2))
-        self.scint_pulse_patches = PatchCollection(pulses_patches, match_original=True)
-        ax.add_collection(self.scint_pulse_patches)
-
-    def Draw3dGeometry(self, ax):
-        # if not self.shouldDraw: return
+    def DrawGeometry(self, ax):
+        # Drawn once for each geometry frame, the hits of each Q/P frame are updated by DrawHits
+        self.scint_position_patches = DataMarkerCollection(ax, Path.unit_rectangle(), offsets=self.geometry.positions, sizes=self.minPatchSize, edgecolor="None", facecolor=self.color, alpha=1.0)
+        ax.add_collection(self.scint_position_patches, autolim=False)
 
-        for pos in self.positions.values():
-            ax.scatter(pos[0], pos[1], pos[2], s=self.minPatchSize, marker="s", edgecolor="None", facecolor=self.color, alpha=1.0)
+        self.scint_pulse_patches = DataMarkerCollection(ax, Path.unit_rectangle(), edgecolor="None", alpha=0.2)
+        ax.add_collection(self.scint_pulse_patches, autolim=False)
 
-        amps = []
-        positions = []
-        time = []
-        pulses_patches = []
+        self.scint_position_patches.set_visible(self.shouldDraw)
+        self.scint_pulse_patches.set_visible(self.shouldDraw)
 
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-            for scintkey in pulses.keys():
-                pulse = pulses[scintkey]
-                pos = self.positions[(scintkey.station, scintkey.panel)]
+    def DrawHits(self, ax):
+        hits = self.allHits
+        relPatchSize = hits.ScaledSizes(self.minPatchSize * 1.2, self.maxPatchSize)
 
-                positions.append(pos)
-                amps.append(pulse.charge)
-                time.append(pulse.t)
+        # The color map is used for showing the time delay of the pulses
+        self.scint_pulse_patches.set_offsets(hits.positions)
+        self.scint_pulse_patches.set_sizes(relPatchSize/2.)
+        self.scint_pulse_patches.set_facecolor(hits.colors)
 
-        if not len(amps): return
+    def Draw3dGeometry(self, ax):
+        # if not self.shouldDraw: return
 
-        amps = np.log10(amps)
-        minAmp = min(amps)
-        maxAmp = max(amps)
+        x, y, z = self.geometry.positions.T
+        ax.scatter(x, y, z, s=self.minPatchSize, marker="s", edgecolor="None", facecolor=self.color, alpha=1.0)
 
-        relPatchSize = self.minPatchSize*1.2 + (self.maxPatchSize - self.minPatchSize*1.2) * (amps - minAmp) / (maxAmp - minAmp + 0.01)
+        self.scint_pulse_points = ax.scatter([], [], [], marker="s", edgecolor="None", alpha=0.2)
 
-        # The color map is used for  showing the time delay of the pulses.
-        # The time is set to 0 by subtracting the min and then it is normalized by dividing the max
-        cmap = cm.get_cmap(self.colorMapType)
-        time = np.subtract(time, min(time))
-        time = np.divide(time, max(time))
-        time = cmap(time)
-        for size, pos, t in zip(relPatchSize, positions, time):
-            ax.scatter(pos[0], pos[1], pos[2], s=size/2.*10, marker="s", edgecolor="None", facecolor=t, alpha=0.2)
+    def Draw3dHits(self, ax):
+        hits = self.allHits
+        relPatchSize = hits.ScaledSizes(self.minPatchSize * 1.2, self.maxPatchSize)
 
-    def ExtractFromQPFrame(self, frame):
-        self.measuredData.clear()
+        # The color map is used for showing the time delay of the pulses
+        SetScatter3d(self.scint_pulse_points, hits.positions, relPatchSize/2.*10, hits.colors)
 
+    def ExtractMeasuredData(self, frame):
+        measuredData = {}
+        resolver = PulseResolver.Of(frame)
         for framekey in self.pulsekeys:
-            if framekey in frame.keys() and len(frame[framekey]) != 0:
-                # handle scintillators
-                scint_map = frame[framekey]
-                pulses = {}
-
-                for scint, vector in scint_map:
-                    pulses[scint] = PulseData(vector[0].time, vector[0].charge, False)
-
-                self.measuredData[framekey] = pulses
+            if framekey in resolver.catalog:
+                # all the pulses of each panel, in the same columnar PulseSeries as the tanks
+                pulses = resolver.Resolve(framekey)
+                if pulses is None:
+                    print(f"WARNING: Could not extract pulses {framekey} from frame")
+                    continue
+
+                if not len(pulses):
+                    continue
+                measuredData[framekey] = pulses
+        return measuredData
 
     def DrawLDF(self, ax, particle):
         if not self.shouldDraw:
             return
 
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-
-            radii = []
-            amps = []
-            time = []
-
-            for scintkey in pulses.keys():
-                pulse = pulses[scintkey]
-                pos = self.positions[(scintkey.station, scintkey.panel)]
-                r = get_radius(particle, pos)
-
-                radii.append(r)
-                amps.append(pulse.charge)
-                time.append(pulse.t)
-
-            cmap = cm.get_cmap(self.colorMapType)
-            time = np.subtract(time, min(time))
-            time = np.divide(time, max(time))
-            time = cmap(time)
-            ax.scatter(radii,  amps, c=time, alpha=0.4, marker=self.shapes[(ikey+1)%len(self.shapes)], label=framekey)
-
-            # Silent stations: pulsesKeys need to be rewritten to be compatible with geometry keys
-            radii = []
-            pulsesKeys = [(scintkey.station, scintkey.panel) for scintkey in pulses.keys()]
-            for key in [el for el in self.positions.keys() if el not in pulsesKeys]:
-                pos = self.positions[key]
-                r = get_radius(particle, pos)
-                radii.append(r)
-            amps = [0.01 for i in range(len(radii))]
+        for ikey, framekey in enumerate(self.hits.keys()):
+            hits = self.hits[framekey]
+            hits.SetParticle(particle)
+            ax.scatter(hits.radius,  hits.charge, c=hits.colors, alpha=0.4, marker=self.shapes[(ikey+1)%len(self.shapes)], label=framekey)
+
+            # Silent stations: geometry rows without pulses, masked once per frame
+            radii = get_radii(particle, self.geometry.positions[self.silent[framekey]])
+            amps = np.full(len(radii), 0.01)
             ax.scatter(radii,  amps, c="w", alpha=0.4, marker=self.shapes[(ikey+1)%len(self.shapes)], edgecolors="k")
 
 
@@ -182,35 +121,10 @@ class Scintillator(Detector):
         if not self.shouldDraw:
             return
 
-        for ikey, framekey in enumerate(self.measuredData.keys()):
-            pulses = self.measuredData[framekey]
-
-            radii = []
-            amps = []
-            time = []
-
-            tCore = particle.time
-            core = np.array([particle.pos[i] for i in range(3)])
-            nDir = np.array([particle.dir.x, particle.dir.y, particle.dir.y])
-
-            for scintkey in pulses.keys():
-                pulse = pulses[scintkey]
-                pos = self.positions[(scintkey.station, scintkey.panel)]
-                r = get_radius(particle, pos)
-                relPos = pos - core
-                delay = tCore + (nDir[0]*relPos[0]+nDir[1]*relPos[1]-nDir[2]*relPos[2]) / I3Constants.c
-                delay = (delay - pulse.t) / I3Units.ns
-
-                radii.append(r)
-                amps.append(delay)
-                time.append(pulse.t)
-
-            # Same as above
-            cmap = cm.get_cmap(self.colorMapType)
-            time = np.subtract(time, min(time))
-            time = np.divide(time, max(time))
-            time = cmap(time)
-            ax.scatter(radii,  amps, c=time, alpha=0.4, marker=self.shapes[(ikey+1)%len(self.shapes)])
+        for ikey, framekey in enumerate(self.hits.keys()):
+            hits = self.hits[framekey]
+            hits.SetParticle(particle)
+            ax.scatter(hits.radius,  hits.delay, c=hits.colors, alpha=0.4, marker=self.shapes[(ikey+1)%len(self.shapes)])
 
             # Silent stations are not needed for the time plot
 
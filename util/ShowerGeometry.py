@@ -0,0 +1,35 @@
+"""
+Shower axis geometry on plain NumPy arrays, without any IceTray object.
+cores are (P, 3) core positions, dirs (P, 3) unit directions and positions (N, 3):
+the results have shape (P, N) (or (P, 3) for the projected cores).
+GeometryTools builds these arrays from I3Particles and I3Constants.
+"""
+
+import numpy as np
+
+
+def AxisDirections(nx, ny):
+    # (P, 3) unit directions from their x and y components, the z component is
+    # -sqrt(1 - nx^2 - ny^2) (a downgoing shower) as in GeometryTools.get_radius
+    nx = np.asarray(nx, dtype=float).reshape(-1)
+    ny = np.asarray(ny, dtype=float).reshape(-1)
+    nz = -np.sqrt(np.clip(1.0 - nx**2 - ny**2, 0.0, None))
+    return np.column_stack([nx, ny, nz])
+
+
+def AxialRadii(cores, dirs, positions):
+    # Distance of each position to the shower axis of each core and direction
+    rel = np.asarray(positions, dtype=float)[None, :, :] - cores[:, None, :]
+    n_prod = np.einsum("pnk,pk->pn", rel, dirs)
+    return np.sqrt(np.clip(np.einsum("pnk,pnk->pn", rel, rel) - n_prod**2, 0.0, None))
+
+
+def PlaneTimes(cores, dirs, coreTimes, positions, c):
+    # Arrival time of the plane shower front at each position, c is the speed of light
+    rel = np.asarray(positions, dtype=float)[None, :, :] - cores[:, None, :]
+    return coreTimes[:, None] + np.einsum("pnk,pk->pn", rel, dirs) / c
+
+
+def ProjectCores(cores, dirs, cosZenith, obslev):
+    # Cores moved along their direction to z = obslev
+    return cores + dirs * ((cores[:, 2] - obslev) / cosZenith)[:, None]
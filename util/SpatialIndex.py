@@ -0,0 +1,122 @@
+"""
+Nearest point queries on the positions of a detector layout, built once per geometry.
+scipy's cKDTree is used when scipy is installed. Otherwise small layouts are searched
+with one vectorized distance computation, and large ones with a uniform grid of about
+one point per cell, searched ring by ring around the cell of the query. Queries outside
+the grid, or not settled after a few rings, take one vectorized pass over all the points.
+"""
+
+import math
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+
+class GridIndex(object):
+    """Points of an (N, 2) array bucketed in square cells"""
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.origin = self.points.min(axis=0)
+        extent = np.ptp(self.points, axis=0)
+        self.cell = max(math.sqrt(extent[0] * extent[1] / len(self.points)), 1e-9)
+        if not extent[0] or not extent[1]:
+            # Points on a line: cells along it
+            self.cell = max(extent.max() / len(self.points), 1e-9)
+        cells = np.floor((self.points - self.origin) / self.cell).astype(np.int64)
+        self.shape = cells.max(axis=0) + 1
+
+        # Rows sorted by cell, cells[i] holds rows[starts[i]:starts[i + 1]]
+        cellIds = cells[:, 0] * self.shape[1] + cells[:, 1]
+        self.rows = np.argsort(cellIds, kind="stable")
+        ids, starts = np.unique(cellIds[self.rows], return_index=True)
+        ends = np.append(starts[1:], len(self.rows))
+        self.cells = {
+            (cellId // self.shape[1], cellId % self.shape[1]): (start, end)
+            for cellId, start, end in zip(ids.tolist(), starts.tolist(), ends.tolist())
+        }
+
+    def __RingRows(self, cx, cy, ring):
+        # Rows of the cells at Chebyshev distance ring from the cell (cx, cy), inside the grid
+        nx, ny = self.shape.tolist()
+        rows = []
+        for ix in range(max(cx - ring, 0), min(cx + ring, nx - 1) + 1):
+            if abs(ix - cx) == ring:
+                iys = range(max(cy - ring, 0), min(cy + ring, ny - 1) + 1)
+            else:
+                iys = [iy for iy in (cy - ring, cy + ring) if 0 <= iy < ny]
+            for iy in iys:
+                span = self.cells.get((ix, iy))
+                if span is not None:
+                    rows.append(self.rows[span[0] : span[1]])
+        return rows
+
+    def __Bound(self, u, cx, cy, ring):
+        # Lower bound of the distance from the query (u in cell units) to the points beyond ring
+        nx, ny = self.shape.tolist()
+        gaps = []
+        if cx + ring + 1 < nx:
+            gaps.append(cx + ring + 1 - u[0])
+        if cx - ring - 1 >= 0:
+            gaps.append(u[0] - (cx - ring))
+        if cy + ring + 1 < ny:
+            gaps.append(cy + ring + 1 - u[1])
+        if cy - ring - 1 >= 0:
+            gaps.append(u[1] - (cy - ring))
+        if not gaps:
+            return np.inf
+        return max(min(gaps), 0.0) * self.cell
+
+    def __BruteForce(self, point):
+        distance = np.sum((self.points - point) ** 2, axis=1)
+        row = int(np.argmin(distance))
+        return np.sqrt(distance[row]), row
+
+    def Nearest(self, point, maxRings=3):
+        # Rings of cells around the query while it is inside the grid. Queries outside of it, or
+        # with empty cells around, are answered with one vectorized pass over all the points
+        point = np.asarray(point, dtype=float)
+        u = (point - self.origin) / self.cell
+        if not (np.all(u >= 0) and np.all(u < self.shape)):
+            return self.__BruteForce(point)
+        cx, cy = np.floor(u).astype(np.int64).tolist()
+        best, bestRow = np.inf, -1
+        for ring in range(maxRings + 1):
+            rows = self.__RingRows(cx, cy, ring)
+            if rows:
+                rows = np.concatenate(rows)
+                distance = np.hypot(*(self.points[rows] - point).T)
+                closest = np.argmin(distance)
+                if distance[closest] < best:
+                    best, bestRow = distance[closest], rows[closest]
+            if best <= self.__Bound(u, cx, cy, ring):
+                return best, int(bestRow)
+        return self.__BruteForce(point)
+
+
+class SpatialIndex(object):
+    """Nearest(point) gives (distance, row) of the closest of the points, (inf, -1) if there are none"""
+
+    def __init__(self, points, gridMinPoints=2000):
+        self.points = np.asarray(points, dtype=float)
+        self.index = None
+        if len(self.points) and cKDTree is not None:
+            self.index = cKDTree(self.points)
+        elif len(self.points) >= gridMinPoints:
+            self.index = GridIndex(self.points)
+
+    def Nearest(self, point):
+        if not len(self.points):
+            return np.inf, -1
+        if cKDTree is not None:
+            distance, row = self.index.query(point)
+            return distance, int(row)
+        if self.index is not None:
+            return self.index.Nearest(point)
+        distance = np.sum((self.points - point) ** 2, axis=1)
+        row = int(np.argmin(distance))
+        return np.sqrt(distance[row]), row
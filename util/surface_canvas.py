@@ -2,9 +2,12 @@ import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 from matplotlib.widgets import MultiCursor, CheckButtons, RadioButtons
+from mpl_toolkits.mplot3d import proj3d
 import math
 
-from util.GeometryTools import ProjectToObslev
+from util.GeometryTools import ProjectToObslev, ProjectToObslevArray
+from util.Blitter import BlitManager
+from util.FrameCatalog import FrameCatalog
 
 from icecube.dataclasses import I3Constants
 from icecube import dataclasses
@@ -31,6 +34,8 @@ class SurfaceCanvas:
         self.paramsKeys = paramsKeys
         self.particleKeys_inframe = []
         self.frame = None
+        # Artists of the current Q/P frame (cores and directions), removed when the next frame is drawn
+        self.frameArtists = []
         if "InIce" in [detector.name for detector in self.detectors]:
             self.plotInIce = True
         else:
@@ -146,13 +151,18 @@ class SurfaceCanvas:
             vertOn=True,
         )
 
+        # The interactive callbacks redraw only the axes they change
+        self.blit = BlitManager(self.fig)
+
     def CheckBoxFunction(self, frame, ax):
         self.__reset_textbox(ax)
+        catalog = FrameCatalog.Of(frame)
         labels = [detector.GetKeyName() for detector in self.detectors] + [
-            el for el in self.particleKeys if el in frame
+            el for el in self.particleKeys if el in catalog
         ]
         activated = [True for i in range(len(labels))]
         self.check = CheckButtons(ax, labels, activated)
+        self.check.drawon = False
         self.check.on_clicked(self.CheckBoxVisible)
         return
 
@@ -166,8 +176,10 @@ class SurfaceCanvas:
                 self.core[label].set_visible(not self.core[label].get_visible())
             if label in self.arrow:
                 self.arrow[label].set_visible(not self.arrow[label].get_visible())
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        changed = [self.axlist["array"], self.axlist["checkboxes"]]
+        if self.plotInIce:
+            changed.append(self.axlist["in_ice"])
+        self.blit.Update(changed)
         return
 
     def RadioFunction(self, label):
@@ -175,8 +187,13 @@ class SurfaceCanvas:
         antenna = [det for det in self.detectors if det.name == "Antenna"][0]
         antenna.selectedKey = label
         antenna.DrawAntennasPlots(self.frame, self.axlist)
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        self.blit.Update(
+            [
+                self.axlist["waveforms_time"],
+                self.axlist["waveforms_freq"],
+                self.axlist["radio_buttons"],
+            ]
+        )
         return
 
     def RadioVisible(self, frame):
@@ -184,20 +201,26 @@ class SurfaceCanvas:
         ax = self.axlist["radio_buttons"]
         self.__reset_textbox(ax)
         antenna = [det for det in self.detectors if det.name == "Antenna"][0]
-        labels = [el for el in antenna.antennakeys if el in frame]
+        catalog = FrameCatalog.Of(frame)
+        labels = [el for el in antenna.antennakeys if el in catalog]
         if labels:
             antenna.selectedKey = labels[0]
         self.radio = RadioButtons(ax, labels)
+        self.radio.drawon = False
         self.radio.on_clicked(self.RadioFunction)
 
     def isADCFunction(self, label):
-        self.__reset_waveforms()
+        # The lines already drawn are updated in place from the cached waveforms
         antenna = [det for det in self.detectors if det.name == "Antenna"][0]
         antenna.isADC = not antenna.isADC
-        antenna.selectedKey = label
         antenna.DrawAntennasPlots(self.frame, self.axlist)
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        self.blit.Update(
+            [
+                self.axlist["waveforms_time"],
+                self.axlist["waveforms_freq"],
+                self.axlist["isADC"],
+            ]
+        )
         return
 
     def isADCVisible(self):
@@ -205,6 +228,7 @@ class SurfaceCanvas:
         ax = self.axlist["isADC"]
         # self.__reset_textbox(ax)
         self.checkADC = CheckButtons(ax, ["isADC"], [False])
+        self.checkADC.drawon = False
         self.checkADC.on_clicked(self.isADCFunction)
 
     def CheckBoxInIceFunction(self, label):
@@ -213,8 +237,10 @@ class SurfaceCanvas:
         self.axlist["time"].set_visible(not self.axlist["time"].get_visible())
         if "InIce" in [detector.name for detector in self.detectors]:
             self.axlist["in_ice"].set_visible(not self.axlist["in_ice"].get_visible())
-        self.fig.canvas.draw()
-        self.fig.canvas.flush_events()
+        changed = [self.axlist["ldf"], self.axlist["time"], self.axlist["inice"]]
+        if self.plotInIce:
+            changed.append(self.axlist["in_ice"])
+        self.blit.Update(changed)
         return
 
     def CheckBoxInIceVisible(self):
@@ -223,6 +249,7 @@ class SurfaceCanvas:
         label = ["LDF-Time/in_ice"]
         activated = [False]
         self.check = CheckButtons(ax, label, activated)
+        self.check.drawon = False
         self.check.on_clicked(self.CheckBoxInIceFunction)
 
     ###########################
@@ -273,7 +300,7 @@ class SurfaceCanvas:
         ax = self.axlist["time"]
         ax.clear()
 
-        ax.axhline(0, color="k", linestyle="--", alpha=0.3)
+        self.zeroDelayLine = ax.axhline(0, color="k", linestyle="--", alpha=0.3)
         ax.set_xlabel("Axial Radius / m")
         ax.set_ylabel("Time w.r.t Plane Front / ns")
         ax.set_xlim(0, 10)
@@ -284,9 +311,7 @@ class SurfaceCanvas:
     def __reset_inice(self):
         ax = self.axlist["in_ice"]
         ax.clear()
-        ax.azim = -60.0
-        ax.dist = 10
-        ax.elev = 0
+        self.__reset_inice_view()
         ax.set_xlim(-600, 600)
         ax.set_ylim(-600, 600)
         ax.set_xlabel("x / m")
@@ -294,6 +319,28 @@ class SurfaceCanvas:
         # ax.set_zlabel("z / m")
         # ax.set_visible(False)
 
+    # Between two Q/P frames only the artists of the frame are removed:
+    # the axis setup and the geometry collections are kept
+    def __clear_frame_artists(self):
+        for artist in self.frameArtists:
+            artist.remove()
+        self.frameArtists = []
+
+    def __clear_plot(self, ax, keep=()):
+        for artist in list(ax.collections) + list(ax.lines) + list(ax.patches):
+            if artist not in keep:
+                artist.remove()
+        if ax.get_legend() is not None:
+            ax.get_legend().remove()
+        ax.relim()
+        ax.autoscale(True)
+
+    def __reset_inice_view(self):
+        ax = self.axlist["in_ice"]
+        ax.azim = -60.0
+        ax.dist = 10
+        ax.elev = 0
+
     def __reset_textbox(self, ax):
         ax.clear()
         ax.set_xticks([])
@@ -316,19 +363,29 @@ class SurfaceCanvas:
 
     # Here the geometry for each detector is stored as a dict.
     # The position of each detector is stored in a numpy array with a key = detector key
-    def update_geometry_frame(self, frame):
+    # geometry holds the arrays already extracted for each detector name (e.g. from the geometry cache)
+    # The geometry collections are created here once, each Q/P frame only updates the hits
+    def update_geometry_frame(self, frame, geometry=None):
         self.__reset_array()
+        if self.plotInIce:
+            self.__reset_inice()
+        self.frameArtists = []
         self.frame = frame
         self.CheckBoxFunction(frame, self.axlist["checkboxes"])
         self.CheckBoxInIceVisible()
         for detector in self.detectors:
-            detector.ExtractFromGFrame(frame)
+            if geometry is not None and detector.name in geometry:
+                detector.SetGeometryArrays(*geometry[detector.name])
+            else:
+                detector.ExtractFromGFrame(frame)
             detector.DrawGeometry(self.axlist["array"])
-            if detector.name == "InIce":
+            if self.plotInIce:
                 detector.Draw3dGeometry(self.axlist["in_ice"])
 
     # Here all the needed info from DAQ or P frame are stored. Then the plots are drawn.
-    def update_DAQ_or_P_frame(self, frame):
+    # measuredData holds the data already extracted (e.g. by the prefetcher) for each detector name
+    # and source the (path, position) of the frame in its file, if known
+    def update_DAQ_or_P_frame(self, frame, measuredData=None, source=None):
         self.frame = frame
         self.CheckBoxFunction(frame, self.axlist["checkboxes"])
         self.CheckBoxInIceVisible()
@@ -337,25 +394,31 @@ class SurfaceCanvas:
             return
 
         self.particles = []
+        self.particleKeys_inframe = []
+        catalog = FrameCatalog.Of(frame)
         for name in self.particleKeys:
-            if name in frame.keys():
+            if name in catalog:
                 self.particles.append(frame[name])
                 self.particleKeys_inframe.append(name)
 
-        self.__reset_ldf()
-        self.__reset_array()
+        self.__clear_frame_artists()
+        self.__clear_plot(self.axlist["ldf"])
+        self.__clear_plot(self.axlist["time"], keep=[self.zeroDelayLine])
         if self.plotInIce:
-            self.__reset_inice()
-        self.__reset_timedelay()
+            self.__reset_inice_view()
         self.__reset_waveforms()
         self.__reset_textbox(self.axlist["isADC"])
 
         for idet, detector in enumerate(self.detectors):
-            detector.ExtractFromQPFrame(frame)
+            detector.frameSource = source
+            if measuredData is not None and detector.name in measuredData:
+                detector.ExtractFromQPFrame(frame, measuredData[detector.name])
+            else:
+                detector.ExtractFromQPFrame(frame)
             if self.plotInIce:
-                detector.Draw3dGeometry(self.axlist["in_ice"])
+                detector.Draw3dHits(self.axlist["in_ice"])
             detector.DrawLDF(self.axlist["ldf"], self.particles[0])
-            detector.DrawGeometry(self.axlist["array"])
+            detector.DrawHits(self.axlist["array"])
             detector.DrawShowerFront(self.axlist["time"], self.particles[0])
             # Labels for the antennas must get separately
             if detector.name == "Antenna":
@@ -370,16 +433,64 @@ class SurfaceCanvas:
         self.__fill_text_box(frame)
 
     def ArrayOnClick(self, event):
-        # Check if the click is in the correct location
+        # Shows the pulses (or the waveforms for an antenna) of the detector closest to the click
+        if event.inaxes is None:
+            return
         if event.inaxes == self.axlist["array"].axes:
-            # Get the position of the closest antenna
-            click_pos = np.asarray([event.xdata, event.ydata])
-            # Resets the waveforms plots and plots the one for the antenna that was selected (clicked on)
-            self.__reset_waveforms()
-            antenna = [det for det in self.detectors if det.name == "Antenna"][0]
-            antenna.AntennaOnClick(click_pos, self.frame, self.axlist)
-            self.fig.canvas.draw()
-            self.fig.canvas.flush_events()
+            picked = self.__pick_on_surface(event.xdata, event.ydata)
+        elif self.plotInIce and event.inaxes == self.axlist["in_ice"].axes:
+            picked = self.__pick_in_ice(event)
+        else:
+            return
+        if picked is None:
+            return
+
+        detector, row = picked
+        # Resets the waveforms plots and shows the detector that was selected (clicked on).
+        # The antenna is deselected, so that the isADC toggle does not draw its traces again
+        self.__reset_waveforms()
+        for det in self.detectors:
+            if det.name == "Antenna" and det is not detector:
+                det.AntennaStationID = "None"
+        detector.OnClick(row, self.frame, self.axlist)
+        self.blit.Update(
+            [
+                self.axlist["waveforms_time"],
+                self.axlist["waveforms_freq"],
+                self.axlist["info_radio"],
+            ]
+        )
+
+    def __pick_on_surface(self, x, y):
+        # Closest of the visible surface detectors, from the spatial index of each geometry
+        picked = None
+        closest = np.inf
+        for detector in self.detectors:
+            if not detector.onSurface or not detector.shouldDraw:
+                continue
+            distance, row = detector.geometry.Nearest((x, y))
+            if distance < closest:
+                picked = (detector, row)
+                closest = distance
+        return picked
+
+    def __pick_in_ice(self, event, maxPixels=10):
+        # Closest DOM on the screen: the DOMs are projected with the current view of the 3D axis.
+        # Only a click on a DOM picks it, the others rotate the view
+        ax = self.axlist["in_ice"]
+        for detector in self.detectors:
+            if detector.onSurface or not detector.shouldDraw:
+                continue
+            if not len(detector.geometry):
+                continue
+            x, y, z = detector.geometry.positions.T
+            xs, ys, _ = proj3d.proj_transform(x, y, z, ax.get_proj())
+            pixels = ax.transData.transform(np.column_stack([xs, ys]))
+            distance = np.sum((pixels - [event.x, event.y]) ** 2, axis=1)
+            row = int(np.argmin(distance))
+            if distance[row] <= maxPixels**2:
+                return detector, row
+        return None
 
     #################################
     ##  Detector non-specific drawing
@@ -389,26 +500,28 @@ class SurfaceCanvas:
         ax = self.axlist["array"]
         self.core = {}
         self.arrow = {}
+        cores = ProjectToObslevArray(self.particles)
         for ipart, particle in enumerate(self.particles):
-            core = dataclasses.I3Position(particle.pos)
-            core = ProjectToObslev(core, particle.dir)
+            core = cores[ipart]
 
             self.core[self.particleKeys_inframe[ipart]] = ax.scatter(
-                core.x, core.y, color=self.colors[ipart % len(self.colors)]
+                core[0], core[1], color=self.colors[ipart % len(self.colors)]
             )
+            self.frameArtists.append(self.core[self.particleKeys_inframe[ipart]])
 
             xy = np.array([particle.dir.x, particle.dir.y])
             xy = xy / np.sqrt(sum(xy**2)) * 100
 
             self.arrow[self.particleKeys_inframe[ipart]] = ax.arrow(
-                core.x,
-                core.y,
+                core[0],
+                core[1],
                 xy[0],
                 xy[1],
                 head_width=10,
                 alpha=0.7,
                 color=self.colors[ipart % len(self.colors)],
             )
+            self.frameArtists.append(self.arrow[self.particleKeys_inframe[ipart]])
 
     def __draw3Dcore(self):
         ax = self.axlist["in_ice"]
@@ -419,11 +532,13 @@ class SurfaceCanvas:
             self.core[self.particleKeys_inframe[ipart]] = ax.scatter(
                 core.x, core.y, core.z, color=self.colors[ipart % len(self.colors)]
             )
+            self.frameArtists.append(self.core[self.particleKeys_inframe[ipart]])
             core = ProjectToObslev(core, particle.dir)
 
             self.core[self.particleKeys_inframe[ipart]] = ax.scatter(
                 core.x, core.y, core.z, color=self.colors[ipart % len(self.colors)]
             )
+            self.frameArtists.append(self.core[self.particleKeys_inframe[ipart]])
 
             # Plot the shower axis
             z = np.array([-500, 1948.071288, 2500])
@@ -437,14 +552,16 @@ class SurfaceCanvas:
             self.arrow[self.particleKeys_inframe[ipart]] = ax.plot(
                 x, y, z, alpha=0.7, color=self.colors[ipart % len(self.colors)]
             )
+            self.frameArtists.extend(self.arrow[self.particleKeys_inframe[ipart]])
 
     def __fill_text_box(self, frame):
         ax = self.axlist["info"]
+        catalog = FrameCatalog.Of(frame)
 
         # First draw the meta-info about the run
         words = "You are viewing a %s frame\n\n" % frame.Stop
 
-        if "I3EventHeader" in frame:
+        if "I3EventHeader" in catalog:
             header = frame["I3EventHeader"]
             evtID = header.event_id
             runID = header.run_id
@@ -464,7 +581,7 @@ class SurfaceCanvas:
         nRows = 2
         item = 0
         for name in self.particleKeys:
-            if name in frame.keys():
+            if name in catalog:
                 words = ""
                 particle = frame[name]
                 words += "{}\n".format(name)
@@ -496,7 +613,7 @@ class SurfaceCanvas:
                 item += 1
 
         for name in self.paramsKeys:
-            if name in frame.keys():
+            if name in catalog:
                 words = ""
                 parameters = I3LaputopParams.from_frame(frame, name)
                 lg_s125 = parameters.value(LaputopParameter.Log10_S125)